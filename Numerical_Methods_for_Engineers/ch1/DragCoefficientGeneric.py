@@ -2,11 +2,56 @@
 
 from numpy import linspace, array, append, logspace, zeros_like, where, vectorize,\
     logical_and
+from math import log10, exp
 import numpy as np
 from matplotlib.pyplot import loglog, xlabel, ylabel, grid, savefig, show, rc,\
     legend, setp
 
-from numpy.core.multiarray import scalar
+# Breakpoints of the piecewise curve fit of cd_sphere: Re in
+# (RE_BREAKPOINTS[i-1], RE_BREAKPOINTS[i]] belongs to bin i, Re <= 0 to bin 0
+# and Re > 8e6 to bin 7
+RE_BREAKPOINTS = array([0.0, 0.5, 100.0, 1.0e4, 3.35e5, 5.0e5, 8.0e6])
+# polynomial coefficients of the fits in the bins 2, 3, 4 and 6
+CD_P3 = array([4.22, -14.05, 34.87, 0.658])         # in 1/Re
+CD_P4 = array([-30.41, 43.72, -17.08, 2.41])        # in 1/log10(Re)
+CD_P5 = array([-0.1584, 2.031, -8.472, 11.932])     # in log10(Re)
+CD_P7 = array([-0.06338, 1.1905, -7.332, 14.93])    # in log10(Re)
+
+
+def _horner(p, x):
+    """polyval(p, x) for an array x, without temporary arrays."""
+    y = np.full_like(x, p[0])
+    for c in p[1:]:
+        y *= x
+        y += c
+    return y
+
+
+def _cd_bin(k, Re):
+    """Drag coefficient of the Reynolds numbers Re (an array, which may be
+    overwritten), which all lie in bin k."""
+    if k == 0:
+        return 0.0
+    if k == 1:
+        return np.divide(24.0, Re, out=Re)
+    if k == 2:
+        return _horner(CD_P3, np.divide(1.0, Re, out=Re))
+    if k == 3:
+        np.log10(Re, out=Re)
+        return _horner(CD_P4, np.divide(1.0, Re, out=Re))
+    if k == 4:
+        return _horner(CD_P5, np.log10(Re, out=Re))
+    if k == 5:
+        Re /= 4.5e5
+        np.log10(Re, out=Re)
+        Re *= Re                        # **4 as two squares, much faster than pow
+        Re *= Re
+        Re *= 91.08
+        Re += 0.0764
+        return Re
+    if k == 6:
+        return _horner(CD_P7, np.log10(Re, out=Re))
+    return 0.2
 
 # single-valued function
 
@@ -88,6 +133,172 @@ def cd_sphere_vector(Re):
     CD = where(Re > 8.0e6, 0.2, CD)  # condition 8
     return CD
 
+# vectorized, binned
+
+
+def cd_sphere_binned(Re, out=None):
+    """Computes the drag coefficient of a sphere as a function of the Reynolds number Re,
+    with the same piecewise definition as cd_sphere, for an array Re.
+    The bin of every Re is found once, as the number of breakpoints below it
+    (which is RE_BREAKPOINTS.searchsorted(Re), but faster for unsorted Re),
+    and each fit is evaluated only on the Reynolds numbers of its own bin,
+    gathered with the indices from a comparison of the int8 bin numbers,
+    so no logarithm is taken of numbers outside the range of the fit.
+    The result is written into out, a C contiguous array of the shape of Re,
+    if it is given."""
+
+    Re = np.asarray(Re, dtype=float)
+    if out is None:
+        out = np.empty(Re.shape)
+    Re_flat, CD_flat = Re.reshape(-1), out.reshape(-1)
+    bins = np.zeros(Re_flat.shape, dtype=np.int8)
+    above = np.empty(Re_flat.shape, dtype=bool)
+    for Re_k in RE_BREAKPOINTS:
+        bins += np.greater(Re_flat, Re_k, out=above)
+    for k in range(RE_BREAKPOINTS.size + 1):
+        in_bin = np.equal(bins, k, out=above)
+        n = np.count_nonzero(in_bin)
+        if n == Re_flat.size:           # all in one bin: no gather and scatter
+            CD_flat[...] = _cd_bin(k, Re_flat.copy())
+        elif n > 0:
+            idx = np.flatnonzero(in_bin)
+            CD_flat[idx] = _cd_bin(k, Re_flat[idx])
+    if np.ndim(out) == 0:
+        return float(CD_flat[0])
+    return out
+
+# tabulated, for the right hand sides of ODEs
+
+CD_TABLE_VERSION = 1    # of the table layout, part of the name of the cached table
+
+
+class CdSphereTable(object):
+    """Lookup table of cd_sphere: log(CD) is tabulated on a uniform grid in
+    log10(Re) from Re_min to 8e6 and interpolated linearly (log-log), which
+    is exact for CD = 24/Re. The number of points per decade is doubled
+    until the largest relative error against cd_sphere, sampled inside every
+    cell, is below rtol. The cells which contain a breakpoint of the
+    piecewise fit, where CD jumps, and Re outside the table use the fit
+    itself. The table is saved as an .npy file in the cache directory of
+    odesolvers (see odesolvers.convergence.cache_dir) and loaded from it
+    the next time; if the cache can not be read or written (e.g. a
+    read-only home directory) the table is only built in memory.
+
+    table(Re) is the O(1) scalar path for a float Re (plain Python floats
+    and lists, no numpy), table.vector(Re, out=None) the path for arrays,
+    and table.report() describes the table and its error."""
+
+    def __init__(self, rtol=1e-5, Re_min=1e-3, cache=True, samples=16):
+        import hashlib
+        import os
+        import ODEschemes           # puts the package odesolvers on sys.path
+        from odesolvers.convergence import cache_dir
+
+        # plain floats, numpy scalars would slow down the scalar path
+        self.rtol, self.Re_min, self.Re_max = rtol, float(Re_min), float(RE_BREAKPOINTS[-1])
+        self.x0 = log10(Re_min)
+        key = repr((CD_TABLE_VERSION, rtol, Re_min, samples, RE_BREAKPOINTS.tolist(),
+                    CD_P3.tolist(), CD_P4.tolist(), CD_P5.tolist(), CD_P7.tolist()))
+        filename = None
+        data = None
+        if cache:                   # an unusable cache only means building the table
+            directory = os.path.join(cache_dir(), 'cd_sphere_table')
+            filename = os.path.join(directory,
+                                    hashlib.sha1(key.encode()).hexdigest() + '.npy')
+            try:
+                if os.path.exists(filename):
+                    data = np.load(filename)
+            except (OSError, ValueError):
+                data = None
+        if data is not None and data.ndim == 1 and data.size > 2:
+            self._setup(int(data[0]), data[2:])
+            self.max_error = float(data[1])
+            self.cached = True
+        else:
+            n = 16
+            while True:
+                self._setup(n, None)
+                self.max_error = self._error(samples)
+                if self.max_error <= rtol or n >= 2**16:
+                    break
+                n *= 2
+            if filename is not None:
+                tmp = '%s.%d.tmp.npy' % (filename[:-4], os.getpid())
+                try:
+                    os.makedirs(directory, exist_ok=True)
+                    np.save(tmp, np.concatenate([[n, self.max_error], self.lnCD]))
+                    os.replace(tmp, filename)
+                except OSError:
+                    if os.path.exists(tmp):
+                        os.remove(tmp)
+            self.cached = False
+
+    def _setup(self, n, lnCD):
+        """The table with n points per decade; lnCD holds the node values
+        if they are known."""
+        self.n = n
+        ncells = int(np.ceil((np.log10(self.Re_max) - self.x0)*n))
+        x = self.x0 + np.arange(ncells + 1)/n
+        if lnCD is None:
+            lnCD = np.log(cd_sphere_binned(10.0**x))
+        self.lnCD = lnCD
+        self.ncells = ncells
+        self.slope = np.diff(lnCD)
+        exact = np.zeros(ncells, dtype=bool)
+        for Re_k in RE_BREAKPOINTS[1:]:
+            i = int(np.floor((np.log10(Re_k) - self.x0)*n))
+            exact[max(i - 1, 0):i + 2] = True     # and its neighbours, for round-off
+        self.exact = exact
+        # plain lists for the scalar path
+        self._lnCD, self._slope, self._exact = lnCD.tolist(), self.slope.tolist(), \
+            exact.tolist()
+
+    def _error(self, samples):
+        """Largest relative error of the interpolation, sampled at samples
+        points inside every cell which is interpolated."""
+        i = np.flatnonzero(~self.exact)
+        theta = (np.arange(samples) + 0.5)/samples
+        Re = 10.0**(self.x0 + (i[:, None] + theta)/self.n)
+        CD = cd_sphere_binned(Re)
+        return np.max(np.abs(self.vector(Re)/CD - 1.0))
+
+    def __call__(self, Re):
+        if not self.Re_min < Re <= self.Re_max:    # also nan
+            return cd_sphere(Re)
+        x = (log10(Re) - self.x0)*self.n
+        i = min(int(x), self.ncells - 1)
+        if self._exact[i]:
+            return cd_sphere(Re)
+        return exp(self._lnCD[i] + self._slope[i]*(x - i))
+
+    def vector(self, Re, out=None):
+        """The table for an array Re; the result is written into out if it
+        is given."""
+        Re = np.asarray(Re, dtype=float)
+        x = np.fmax(Re, self.Re_min)            # Re outside the table and nan are
+        np.fmin(x, self.Re_max, out=x)          # looked up at an end, then replaced
+        np.log10(x, out=x)
+        x -= self.x0
+        x *= self.n
+        i = np.clip(x, 0, self.ncells - 1).astype(np.intp)
+        x -= i
+        x *= self.slope[i]
+        x += self.lnCD[i]
+        CD = np.exp(x, out=out if out is not None else x)
+        special = ~((Re > self.Re_min) & (Re <= self.Re_max)) | self.exact[i]
+        if special.any():
+            CD[special] = cd_sphere_binned(Re[special])
+        return CD
+
+    def report(self):
+        return ('CD(Re) table for %g < Re <= %g: %d points per decade, %d cells, %d '
+                'computed exactly; max relative error %.2e (bound %.0e)%s'
+                % (self.Re_min, self.Re_max, self.n, self.ncells, np.count_nonzero(self.exact),
+                   self.max_error, self.rtol, ', from the cache' if self.cached else ''))
+
+
+cd_sphere_table = CdSphereTable()
+
 # vectorized boolean
 
 
@@ -143,26 +354,30 @@ if __name__ == '__main__':
     # make a vectorized version of the function automatically
     cd_sphere_auto_vector = vectorize(cd_sphere)
 
+    def cd_sphere_table_vector(Re):
+        return cd_sphere_table.vector(Re)
+
+    print(cd_sphere_table.report())
+
     # make a list of all function objects
     funcs = [cd_sphere_py_vector, cd_sphere_vector, cd_sphere_vector_bool,
-             cd_sphere_auto_vector]  # list of functions to test
+             cd_sphere_binned, cd_sphere_table_vector, cd_sphere_auto_vector]  # list of functions to test
 
     # Put all exec_times in a dictionary and fncnames in a list
     exec_times = {}
     fncnames = []
     for func in funcs:
-        try:
-            name = func.func_name
-        except:
-            scalarname = func.__getattribute__('pyfunc')
-            name = scalarname.__name__+'_auto_vector'
+        if isinstance(func, vectorize):
+            name = func.pyfunc.__name__+'_auto_vector'
+        else:
+            name = func.__name__
 
         fncnames.append(name)
 
         # benchmark
-        t0 = time.clock()
+        t0 = time.perf_counter()
         CD[name] = func(ReNrs)
-        exec_times[name] = time.clock() - t0
+        exec_times[name] = time.perf_counter() - t0
 
     # sort the dictionary exec_times on values and return a list of the corresponding keys
     exec_keys_sorted = sorted(exec_times, key=exec_times.get)
@@ -177,14 +392,13 @@ if __name__ == '__main__':
     rc('font', **font)
 
     # set line styles
-    style = ['v-', '8-', '*-', 'o-']
-    mrkevry = [30, 35, 40, 45]
+    style = ['v-', '8-', '*-', 's-', 'd-', 'o-']
+    mrkevry = [30, 35, 40, 45, 50, 55]
 
     # plot the result for all functions
     i = 0
     for name in fncnames:
         loglog(ReNrs, CD[name], style[i], markersize=10, markevery=mrkevry[i])
-        hold('on')
         i += 1
 
     # use fncnames as plot legend
@@ -1,6 +1,6 @@
 # src-ch1/FallingSphereEulerHeunRK4.py;ODEschemes.py @ git@lrhgit/tkt4140/src/src-ch1/ODEschemes.py;
 
-from DragCoefficientGeneric import cd_sphere
+from DragCoefficientGeneric import cd_sphere_table
 from ODEschemes import euler, heun, rk4
 from matplotlib.pyplot import *
 import numpy as np
@@ -19,22 +19,26 @@ nu = 1.5e-5   # Kinematical viscosity [m^2/s]
 CD = 0.4      # Constant drag coefficient
 
 
-def f(z, t):
-    """2x2 system for sphere with constant drag."""
-    zout = np.zeros_like(z)
+def f(z, t, out=None):
+    """2x2 system for sphere with constant drag.
+    Writes into out if given (see ODEschemes.rhs_inplace)."""
+    zout = np.empty_like(z) if out is None else out
     alpha = 3.0*rho_f/(4.0*rho_s*d)*CD
-    zout[:] = [z[1], g - alpha*z[1]**2]
+    zout[0] = z[1]
+    zout[1] = g - alpha*z[1]**2
     return zout
 
 
-def f2(z, t):
-    """2x2 system for sphere with Re-dependent drag."""
-    zout = np.zeros_like(z)
+def f2(z, t, out=None):
+    """2x2 system for sphere with Re-dependent drag.
+    Writes into out if given (see ODEschemes.rhs_inplace)."""
+    zout = np.empty_like(z) if out is None else out
     v = abs(z[1])
     Re = v*d/nu
-    CD = cd_sphere(Re)
+    CD = cd_sphere_table(Re)
     alpha = 3.0*rho_f/(4.0*rho_s*d)*CD
-    zout[:] = [z[1], g - alpha*z[1]**2]
+    zout[0] = z[1]
+    zout[1] = g - alpha*z[1]**2
     return zout
 
 # main program starts here
@@ -48,17 +52,19 @@ z0 = np.zeros(2)
 z0[0] = 2.0
 
 # compute response with constant CD using Euler's method
-ze = euler(f, z0, time)
+ze = euler(f, z0, time, inplace=True)
 # compute response with varying CD using Euler's method
-ze2 = euler(f2, z0, time)
+ze2 = euler(f2, z0, time, inplace=True)
 
 # compute response with constant CD using Heun's method
-zh = heun(f, z0, time)
+zh = heun(f, z0, time, inplace=True)
 # compute response with varying CD using Heun's method
-zh2 = heun(f2, z0, time)
+zh2 = heun(f2, z0, time, inplace=True)
 
-zrk4 = rk4(f, z0, time)     # compute response with constant CD using RK4
-zrk4_2 = rk4(f2, z0, time)  # compute response with varying CD using RK4
+# compute response with constant CD using RK4
+zrk4 = rk4(f, z0, time, inplace=True)
+# compute response with varying CD using RK4
+zrk4_2 = rk4(f2, z0, time, inplace=True)
 
 k1 = np.sqrt(g*4*rho_s*d/(3*rho_f*CD))
 k2 = np.sqrt(3*rho_f*g*CD/(4*rho_s*d))
@@ -1,5 +1,5 @@
 # src-ch1/FallingSphereEulerHeun.py;ODEschemes.py @ git@lrhgit/tkt4140/src/src-ch1/ODEschemes.py;
-from DragCoefficientGeneric import cd_sphere
+from DragCoefficientGeneric import cd_sphere_table
 from ODEschemes import euler, heun
 from matplotlib.pyplot import *
 import numpy as np
@@ -31,7 +31,7 @@ def f2(z, t):
     zout = np.zeros_like(z)
     v = abs(z[1])
     Re = v*d/nu
-    CD = cd_sphere(Re)
+    CD = cd_sphere_table(Re)
     alpha = 3.0*rho_f/(4.0*rho_s*d)*CD
     zout[:] = [z[1], g - alpha*z[1]**2]
     return zout
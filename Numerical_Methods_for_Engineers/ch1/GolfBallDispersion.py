@@ -0,0 +1,174 @@
+# src-ch1/GolfBallDispersion.py;ParticleMotion2DBatch.py @ git@lrhgit/tkt4140/src/src-ch1/ParticleMotion2DBatch.py;ODEschemes.py @ git@lrhgit/tkt4140/src/src-ch1/ODEschemes.py;
+
+# Monte Carlo dispersion of golf ball shots (the drag and lift model f3 of
+# ParticleMotion2D) under uncertain launch speed, angle, spin and wind.
+# The samples are drawn and integrated in chunks, one batched rk4 run per
+# chunk on a pool of processes, and only summary statistics of the chunks
+# are kept: mean and covariance of the carry, the flight time and the apex
+# height, merged with the pairwise formulas of Chan et al., and a histogram
+# of the carry for its percentiles.
+
+import os
+import numpy as np
+from ODEschemes import rk4
+from ParticleMotion2DBatch import BallRHS, hit_ground, launch_states
+
+QUANTITIES = ('carry [m]', 'flight time [s]', 'apex [m]')
+
+# mean and standard deviation of the normally distributed launch conditions
+LAUNCH = {'v0': (50.0, 2.0),       # launch speed [m/s]
+          'angle': (15.0, 1.5),    # angle of elevation [degrees]
+          'nrpm': (3500.0, 300.0),  # spin [rpm]
+          'vfx': (0.0, 2.0),       # x-component of the wind [m/s]
+          'vfy': (0.0, 0.5)}       # y-component of the wind [m/s]
+
+
+def sample_launches(rng, n, launch=LAUNCH):
+    """n samples of the launch conditions drawn from the numpy Generator rng,
+    as a dict of arrays with the keys of launch."""
+    return dict((name, rng.normal(mean, std, n)) for name, (mean, std) in sorted(launch.items()))
+
+
+class DispersionStats(object):
+    """Streaming summary of samples of the quantities QUANTITIES: count,
+    mean, the sums of squared deviations M2 (so that the covariance is
+    M2/(count - 1)), extremes and a histogram of the carry with bins of
+    width bin_width from 0 to carry_max. Two summaries are merged exactly
+    (up to round-off) with the pairwise update of Chan, Golub and LeVeque,
+    so chunks may be summarized in any worker and merged in chunk order."""
+
+    def __init__(self, carry_max=400.0, bin_width=0.05):
+        m = len(QUANTITIES)
+        self.count = 0
+        self.mean = np.zeros(m)
+        self.M2 = np.zeros((m, m))
+        self.minimum = np.full(m, np.inf)
+        self.maximum = np.full(m, -np.inf)
+        self.edges = np.linspace(0.0, carry_max, int(round(carry_max/bin_width)) + 1)
+        self.hist = np.zeros(self.edges.size + 1, dtype=np.int64)  # with under- and overflow
+        self.not_landed = 0
+
+    def add(self, q):
+        """Add the samples q, an (n, len(QUANTITIES)) array."""
+        q = np.asarray(q, dtype=float)
+        if q.shape[0] == 0:
+            return
+        chunk = DispersionStats.__new__(DispersionStats)
+        chunk.count = q.shape[0]
+        chunk.mean = q.mean(axis=0)
+        d = q - chunk.mean
+        chunk.M2 = d.T @ d
+        chunk.minimum, chunk.maximum = q.min(axis=0), q.max(axis=0)
+        chunk.edges = self.edges
+        chunk.hist = np.bincount(np.searchsorted(self.edges, q[:, 0], side='right'),
+                                 minlength=self.hist.size)
+        chunk.not_landed = 0
+        self.merge(chunk)
+
+    def merge(self, other):
+        """Add the samples summarized by the DispersionStats other."""
+        if other.edges.size != self.edges.size or other.edges[-1] != self.edges[-1]:
+            raise ValueError('the histograms of the summaries have different bins')
+        self.hist += other.hist
+        self.not_landed += other.not_landed
+        n_a, n_b = self.count, other.count
+        if n_b == 0:
+            return
+        n = n_a + n_b
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta*(n_b/n)
+        self.M2 = self.M2 + other.M2 + np.outer(delta, delta)*(n_a*n_b/n)
+        self.minimum = np.minimum(self.minimum, other.minimum)
+        self.maximum = np.maximum(self.maximum, other.maximum)
+        self.count = n
+
+    @property
+    def covariance(self):
+        return self.M2/(self.count - 1)
+
+    @property
+    def std(self):
+        return np.sqrt(np.diag(self.covariance))
+
+    def percentile(self, p):
+        """Percentiles p (in %) of the carry, interpolated linearly inside the
+        bins of the histogram, so they are accurate to the bin width."""
+        p = np.asarray(p, dtype=float)
+        if self.hist[0] or self.hist[-1]:
+            raise ValueError('carries outside [0, %g] m; increase carry_max' % self.edges[-1])
+        cdf = np.concatenate([[0.0], np.cumsum(self.hist[1:-1])])/self.count
+        return np.interp(p/100.0, cdf, self.edges)
+
+    def report(self, percentiles=(5, 25, 50, 75, 95)):
+        lines = ['%d shots (%d did not land)' % (self.count, self.not_landed)]
+        for k, name in enumerate(QUANTITIES):
+            lines.append('    %-16s mean %8.3f  std %7.3f  min %8.3f  max %8.3f'
+                         % (name, self.mean[k], self.std[k], self.minimum[k], self.maximum[k]))
+        corr = self.covariance/np.outer(self.std, self.std)
+        lines.append('    correlation of %s:' % ', '.join(QUANTITIES))
+        lines += ['        ' + '  '.join('%6.3f' % c for c in row) for row in corr]
+        lines.append('    carry percentiles: ' + ', '.join(
+            '%g%%: %.2f m' % (p, c) for p, c in zip(percentiles, self.percentile(percentiles))))
+        return '\n'.join(lines)
+
+
+def shoot_chunk(task):
+    """Draw the launch conditions of one chunk from its SeedSequence, fly the
+    balls as one ensemble and return their DispersionStats."""
+    seed, n, launch, time, carry_max, bin_width = task
+    s = sample_launches(np.random.default_rng(seed), n, launch)
+    f = BallRHS('lift', nrpm=s['nrpm'], vfx=s['vfx'], vfy=s['vfy'])
+    z, info = rk4(f, launch_states(s['v0'], s['angle']), time, inplace=True,
+                  events=hit_ground, full_output=True)
+    landed = info['member_events'][0]
+    q = np.empty((landed.size, len(QUANTITIES)))
+    q[:, 0] = z[-1, landed, 0]
+    q[:, 1] = info['t_events'][0] - time[0]
+    q[:, 2] = z[:, landed, 1].max(axis=0)
+    stats = DispersionStats(carry_max, bin_width)
+    stats.add(q)
+    stats.not_landed = n - landed.size
+    return stats
+
+
+def dispersion(n_samples, seed=0, launch=LAUNCH, chunk_size=4096, workers=None,
+               time=np.linspace(0, 10, 201), carry_max=400.0, bin_width=0.05):
+    """DispersionStats of n_samples golf ball shots with the launch
+    conditions of launch (see LAUNCH), integrated with rk4 on time until
+    they land. The samples are drawn in chunks of chunk_size, each from its
+    own child of numpy.random.SeedSequence(seed), and the chunks are
+    distributed over a pool of workers processes (default: the number of
+    cores; workers=1 runs them in this process). The chunk summaries are
+    merged in chunk order, so the result depends on seed and chunk_size
+    only, not on the number of workers. Only the summary of each chunk is
+    kept, so the memory does not grow with n_samples."""
+
+    n_chunks = -(-n_samples//chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(n_chunks)
+    tasks = [(seeds[k], min(chunk_size, n_samples - k*chunk_size), launch, time,
+              carry_max, bin_width) for k in range(n_chunks)]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    stats = DispersionStats(carry_max, bin_width)
+    if workers > 1 and n_chunks > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=min(workers, n_chunks)) as pool:
+            for chunk in pool.map(shoot_chunk, tasks):
+                stats.merge(chunk)
+    else:
+        for task in tasks:
+            stats.merge(shoot_chunk(task))
+    return stats
+
+
+if __name__ == '__main__':
+    import sys
+    import time as timer
+
+    n_samples = int(float(sys.argv[1])) if len(sys.argv) > 1 else 100000
+    tic = timer.perf_counter()
+    stats = dispersion(n_samples, seed=2024)
+    seconds = timer.perf_counter() - tic
+    print(stats.report())
+    print('%.1f s on %d cores (%.1f us per shot)'
+          % (seconds, os.cpu_count() or 1, 1e6*seconds/n_samples))
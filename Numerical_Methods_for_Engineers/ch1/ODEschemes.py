@@ -1,78 +1,51 @@
 # src-ch1/ODEschemes.py
 
-import numpy as np
-from matplotlib.pyplot import plot, show, legend, rcParams, rc, figure, axhline, close,\
-    xticks, title, xlabel, ylabel, savefig, axis, grid, subplots, setp
-
-# change some default values to make plots more readable
-LNWDT = 2
-FNT = 10
-rcParams['lines.linewidth'] = LNWDT
-rcParams['font.size'] = FNT
-
-
-# define Euler solver
-def euler(func, z0, time):
-    """The Euler scheme for solution of systems of ODEs.
-    z0 is a vector for the initial conditions,
-    the right hand side of the system is represented by func which returns
-    a vector with the same size as z0 ."""
-
-    z = np.zeros((np.size(time), np.size(z0)))
-    z[0, :] = z0
-
-    for i in range(len(time)-1):
-        dt = time[i+1] - time[i]
-        z[i+1, :] = z[i, :] + np.asarray(func(z[i, :], time[i]))*dt
-
-    return z
-
-
-# define Heun solver
-def heun(func, z0, time):
-    """The Heun scheme for solution of systems of ODEs.
-    z0 is a vector for the initial conditions,
-    the right hand side of the system is represented by func which returns
-    a vector with the same size as z0 ."""
-
-    z = np.zeros((np.size(time), np.size(z0)))
-    z[0, :] = z0
-    zp = np.zeros_like(z0)
+import os
+import sys
 
-    for i, t in enumerate(time[0:-1]):
-        dt = time[i+1] - time[i]
-        zp = z[i, :] + np.asarray(func(z[i, :], t))*dt   # Predictor step
-        z[i+1, :] = z[i, :] + (np.asarray(func(z[i, :], t)) +
-                               np.asarray(func(zp, t+dt)))*dt/2.0  # Corrector step
+import numpy as np
 
-    return z
+# The schemes are implemented in the package odesolvers next to the chapter
+# directories, which imports neither matplotlib nor scipy; import from it
+# directly in code that does not need the plots below.
+_root = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+if _root not in [os.path.abspath(path) for path in sys.path]:
+    sys.path.insert(0, _root)
 
+import odesolvers
+from odesolvers import allocate_solution, state_shape, rhs_inplace, integrate, \
+    euler, heun, rk4
 
-# define rk4 scheme
-def rk4(func, z0, time):
-    """The Runge-Kutta 4 scheme for solution of systems of ODEs.
-    z0 is a vector for the initial conditions,
-    the right hand side of the system is represented by func which returns
-    a vector with the same size as z0 ."""
 
-    z = np.zeros((np.size(time), np.size(z0)))
-    z[0, :] = z0
-    zp = np.zeros_like(z0)
+def __getattr__(name):
+    # the other solvers (dopri45, the implicit schemes, parareal, ...) are
+    # imported from odesolvers on first use, as in the package itself
+    try:
+        value = getattr(odesolvers, name)
+    except AttributeError:
+        raise AttributeError('module %r has no attribute %r' % (__name__, name)) from None
+    globals()[name] = value
+    return value
 
-    for i, t in enumerate(time[0:-1]):
-        dt = time[i+1] - time[i]
-        dt2 = dt/2.0
-        k1 = np.asarray(func(z[i, :], t))                # predictor step 1
-        k2 = np.asarray(func(z[i, :] + k1*dt2, t + dt2))  # predictor step 2
-        k3 = np.asarray(func(z[i, :] + k2*dt2, t + dt2))  # predictor step 3
-        k4 = np.asarray(func(z[i, :] + k3*dt, t + dt))   # predictor step 4
-        z[i+1, :] = z[i, :] + dt/6.0 * \
-            (k1 + 2.0*k2 + 2.0*k3 + k4)  # Corrector step
 
-    return z
+def __dir__():
+    return sorted(set(globals()) | set(odesolvers.__all__))
 
 
 if __name__ == '__main__':
+    from odesolvers import adams_bashforth, adams_moulton, dopri45, \
+        backward_euler, crank_nicolson, bdf2, symplectic_euler, verlet, yoshida4, \
+        parareal, shoot, TridiagonalBVP, convergence_study, fit_order, stream, run_to_sink, \
+        NpySink, checkpointed, EventTracker, DenseOutput, SolverStats, ManufacturedSolution
+    from matplotlib.pyplot import plot, show, legend, rcParams, rc, figure, axhline, close,\
+        xticks, title, xlabel, ylabel, savefig, axis, grid, subplots, setp
+
+    # change some default values to make plots more readable
+    LNWDT = 2
+    FNT = 10
+    rcParams['lines.linewidth'] = LNWDT
+    rcParams['font.size'] = FNT
+
     a = 0.2
     b = 3.0
     def u_exact(t): return a*t + b
@@ -106,6 +79,543 @@ if __name__ == '__main__':
             msg = '%s failed with error = %g' % (scheme.__name__, max_error)
             assert max_error < tol, msg
 
+    def test_ensemble():
+        """Check that an ensemble run equals the member-by-member runs."""
+        from numpy import linspace
+
+        tol = 1E-14
+        time = linspace(0, 1.5, 31)
+        z0 = np.linspace(0.5, 2.0, 7).reshape(-1, 1)
+
+        for scheme in [euler, heun, rk4]:
+            z = scheme(f3, z0, time)
+            assert z.shape == (time.size, z0.shape[0], 1)
+            for m in range(z0.shape[0]):
+                max_error = np.max(np.abs(z[:, m, :] - scheme(f3, z0[m], time)))
+                msg = '%s ensemble failed with error = %g' % (scheme.__name__, max_error)
+                assert max_error < tol, msg
+
+    def test_dopri45():
+        """Check that dopri45 meets its tolerance with fewer RHS calls than rk4."""
+        from numpy import linspace
+
+        time = linspace(0, 1.5, 4)
+        z0 = 2.0
+        for tol in [1E-4, 1E-6, 1E-8]:
+            z, info = dopri45(f3, z0, time, rtol=tol, atol=tol, full_output=True)
+            rel_error = np.max(np.abs(z[:, 0]/u_nonlin_analytical(z0, time) - 1))
+            msg = 'dopri45 failed with error = %g for tol = %g' % (rel_error, tol)
+            assert rel_error < 10*tol, msg
+            assert info['nfev'] == 2 + 6*(info['naccept'] + info['nreject'])
+
+    def test_stream():
+        """Check that the streamed and decimated states equal the full solution."""
+        from numpy import linspace
+
+        time = linspace(0, 1.5, 101)
+        z0 = np.linspace(0.5, 2.0, 3).reshape(-1, 1)
+        for scheme in [euler, heun, rk4]:
+            z = scheme(f3, z0, time)
+            for save_every, chunk_size in [(1, 7), (3, 5), (10, 1000)]:
+                chunks = [(tc.copy(), zc.copy()) for tc, zc in
+                          stream(scheme, f3, z0, time, chunk_size, save_every)]
+                t_s = np.concatenate([tc for tc, zc in chunks])
+                z_s = np.concatenate([zc for tc, zc in chunks])
+                assert np.array_equal(t_s, time[::save_every])
+                assert np.array_equal(z_s, z[::save_every]), scheme.__name__
+
+    def test_implicit():
+        """Check the order of the implicit schemes and their stability for a
+        stiff problem at a time step far above the explicit stability limit."""
+        from numpy import linspace, log2
+
+        z0 = 2.0
+        for scheme, order in [(backward_euler, 1), (crank_nicolson, 2), (bdf2, 2)]:
+            errors = []
+            for N in [40, 80]:
+                time = linspace(0, 1.5, N+1)
+                z = scheme(f3, z0, time)
+                errors.append(np.max(np.abs(z[:, 0] - u_nonlin_analytical(z0, time))))
+            observed = log2(errors[0]/errors[1])
+            msg = '%s has order %g' % (scheme.__name__, observed)
+            assert abs(observed - order) < 0.2, msg
+
+            def stiff(z, t): return -1000.0*(z - np.cos(t))
+            time = linspace(0, 2, 21)
+            z, info = scheme(stiff, 1.0, time, jac=lambda z, t: [[-1000.0]],
+                             full_output=True)
+            assert np.max(np.abs(z[:, 0] - np.cos(time))) < 1E-2, scheme.__name__
+            assert info['nlu'] == 1 + (scheme is bdf2), scheme.__name__
+
+    def test_events():
+        """Check the landing time and point of a projectile without drag, for
+        a single state and for an ensemble with one landing time per member."""
+        from numpy import linspace
+
+        g = 9.81
+
+        def projectile(z, t):
+            zout = np.zeros_like(z)
+            zout[..., 0] = z[..., 2]
+            zout[..., 1] = z[..., 3]
+            zout[..., 3] = -g
+            return zout
+
+        def hit_ground(z, t): return z[..., 1]
+        hit_ground.terminal = True
+        hit_ground.direction = -1
+
+        time = linspace(0, 10, 101)
+        z0 = np.array([[0.0, 0.0, 10.0, 10.0], [0.0, 0.0, 5.0, 20.0]])
+        t_landing = 2*z0[:, 3]/g
+        for scheme in [heun, rk4, dopri45]:
+            z, info = scheme(projectile, z0[0], time, events=hit_ground, full_output=True)
+            assert abs(info['t'][-1] - t_landing[0]) < 1E-12, scheme.__name__
+            assert abs(z[-1, 0] - z0[0, 2]*t_landing[0]) < 1E-10, scheme.__name__
+            assert len(z) == np.searchsorted(time, t_landing[0]) + 1
+
+            z, info = scheme(projectile, z0, time, events=hit_ground, full_output=True)
+            assert np.allclose(info['t_events'][0][np.argsort(info['member_events'][0])],
+                               t_landing, rtol=1E-12, atol=0), scheme.__name__
+            assert np.allclose(z[-1, :, 0], z0[:, 2]*t_landing, rtol=1E-12), scheme.__name__
+
+    def test_dense_output():
+        """Check that the dense output reproduces the time steps and that
+        its error between them converges as fast as the scheme."""
+        from numpy import linspace, log2
+
+        z0 = 2.0
+        t_query = linspace(0, 1.5, 1001)
+        for scheme, order in [(euler, 1), (heun, 2), (rk4, 4), (bdf2, 2)]:
+            errors = []
+            for N in [40, 80]:
+                time = linspace(0, 1.5, N+1)
+                z, info = scheme(f3, z0, time, dense_output=True)
+                assert np.max(np.abs(info['sol'](time) - z)) < 1E-12*np.max(np.abs(z))
+                z_query = info['sol'](t_query)[:, 0]
+                errors.append(np.max(np.abs(z_query - u_nonlin_analytical(z0, t_query))))
+            observed = log2(errors[0]/errors[1])
+            msg = '%s dense output has order %g' % (scheme.__name__, observed)
+            assert observed > order - 0.3, msg
+
+        z, info = dopri45(f3, z0, [0, 1.5], rtol=1E-8, atol=1E-8, dense_output=True)
+        rel_error = np.max(np.abs(info['sol'](t_query)[:, 0]/u_nonlin_analytical(z0, t_query) - 1))
+        assert rel_error < 1E-7, 'dopri45 dense output failed with error = %g' % rel_error
+
+    def test_stats():
+        """Check the counts of SolverStats against the number of steps and
+        the counters returned with full_output."""
+        from numpy import linspace
+
+        N = 100
+        time = linspace(0, 1, N+1)
+        for scheme, nstages in [(euler, 1), (heun, 2), (rk4, 4)]:
+            stats = SolverStats(step_times=True)
+            scheme(f3, 1.0, time, stats=stats)
+            assert stats.nfev == nstages*N, scheme.__name__
+            assert stats.naccept == N and len(stats.step_times) == N, scheme.__name__
+            assert 0 < stats.time_rhs < stats.time_total, scheme.__name__
+
+        stats = SolverStats()
+        z, info = dopri45(f3, 1.0, [0, 1], full_output=True, stats=stats)
+        assert (stats.nfev, stats.naccept, stats.nreject) == \
+            (info['nfev'], info['naccept'], info['nreject'])
+
+        def threshold(z, t):
+            return z[0] - 2.0
+
+        for options in [{}, {'dense_output': True}, {'events': threshold}]:
+            for scheme in [backward_euler, bdf2]:
+                stats = SolverStats()
+                z, info = scheme(f3, 1.0, time, full_output=True, stats=stats, **options)
+                assert (stats.nfev, stats.njev, stats.nlu) == \
+                    (info['nfev'], info['njev'], info['nlu']), (scheme.__name__, options)
+
+        stats = SolverStats()
+        for t_chunk, z_chunk in stream(rk4, f3, 1.0, time, chunk_size=30, stats=stats):
+            pass
+        assert stats.nfev == 4*N and stats.naccept == N
+
+        def oscillator(z, t):
+            return np.array([z[1], -z[0]])
+
+        for scheme in [adams_moulton, verlet]:
+            stats, stats_stream = SolverStats(), SolverStats()
+            scheme(oscillator, [1.0, 0.0], time, stats=stats)
+            for t_chunk, z_chunk in stream(scheme, oscillator, [1.0, 0.0], time,
+                                           chunk_size=30, stats=stats_stream):
+                pass
+            assert stats.nfev_saved > 0, scheme.__name__
+            assert (stats_stream.nfev, stats_stream.nfev_saved) == \
+                (stats.nfev, stats.nfev_saved), scheme.__name__
+
+    def test_fsal():
+        """Check that values of f known from the events or the stepper are
+        reused without changing the solution."""
+        from numpy import linspace, array, array_equal
+
+        def f(z, t):
+            return [z[1], -z[0]]
+
+        def crossing(z, t):
+            return z[0]
+
+        N = 200
+        time = linspace(0, 10, N+1)
+        for scheme, nstages in [(euler, 1), (heun, 2), (rk4, 4)]:
+            stats = SolverStats()
+            z, info = scheme(f, [0.5, 1.0], time, events=crossing, full_output=True,
+                             stats=stats)
+            ncross = len(info['t_events'][0])
+            assert array_equal(z, scheme(f, [0.5, 1.0], time)), scheme.__name__
+            assert ncross == 3 and stats.nfev_saved == 2*ncross, scheme.__name__
+            assert stats.nfev + stats.nfev_saved == nstages*N + 2*ncross, scheme.__name__
+
+        stats = SolverStats()
+        z, info = dopri45(f, [0.5, 1.0], [0, 10], events=crossing, full_output=True,
+                          stats=stats)
+        ncross = len(info['t_events'][0])
+        assert stats.nfev == info['nfev'] and ncross == 3
+        assert stats.nfev_saved == info['naccept'] + info['nreject'] + 2*ncross
+
+        stats = SolverStats()
+        z, info = crank_nicolson(f, [0.5, 1.0], time, dense_output=True, stats=stats)
+        assert stats.nfev_saved == 2*N - 1      # f_end in all but the first step and point
+
+    def test_multistep():
+        """Check the order of the Adams schemes, their number of evaluations
+        of f per step and that they stop at events like the other schemes."""
+        from numpy import linspace, log, log2
+
+        z0 = 2.0
+        for scheme, nfev_step in [(adams_bashforth, 1), (adams_moulton, 2)]:
+            for order in [2, 3, 4]:
+                errors = []
+                for N in [100, 200]:
+                    time = linspace(0, 1.5, N+1)
+                    stats = SolverStats()
+                    z = scheme(f3, z0, time, order=order, stats=stats)
+                    errors.append(abs(z[-1, 0] - u_nonlin_analytical(z0, time[-1])))
+                assert stats.nfev <= nfev_step*N + 4*(order - 1), scheme.__name__
+                observed = log2(errors[0]/errors[1])
+                msg = '%s order %d has order %g' % (scheme.__name__, order, observed)
+                assert observed > order - 0.2, msg
+
+            def zero(z, t):
+                return z[0] - 10.0
+            zero.terminal = True
+            time = linspace(0, 1.5, 301)
+            z, info = scheme(f3, z0, time, events=zero, full_output=True)
+            t_exact = log((10.0 - 0.5)/(z0 - 0.5))/2
+            assert abs(info['t'][-1] - t_exact) < 1E-6, scheme.__name__
+
+    def test_symplectic():
+        """Check the order of the symplectic schemes on the harmonic
+        oscillator and that the energy of the nonlinear pendulum stays
+        bounded over many periods with a large time step."""
+        from numpy import linspace, log2, cos, sin, pi
+
+        def pendulum(z, t):
+            return [z[1], -sin(z[0])]
+
+        for scheme, order in [(symplectic_euler, 1), (verlet, 2), (yoshida4, 4)]:
+            errors = []
+            for N in [200, 400]:
+                time = linspace(0, 5, N+1)
+                z = scheme(lambda z, t: [z[1], -z[0]], [1.0, 0.0], time)
+                errors.append(abs(z[-1, 0] - cos(5)))
+            observed = log2(errors[0]/errors[1])
+            assert abs(observed - order) < 0.1, '%s has order %g' % (scheme.__name__, observed)
+
+            time = linspace(0, 200*pi, 2001)
+            z = scheme(pendulum, [1.0, 0.0], time)
+            E = 0.5*z[:, 1]**2 + 1 - cos(z[:, 0])
+            assert np.max(np.abs(E - E[0])) < 0.2*E[0], scheme.__name__
+
+    def test_parareal():
+        """Check that parareal converges to the serial fine solution, and
+        reproduces it after n_slices iterations, also when max_iter is
+        larger."""
+        from numpy import linspace
+
+        time = linspace(0, 1.5, 1201)
+        z_rk4 = rk4(f3, 2.0, time)
+        z, info = parareal(f3, 2.0, time, n_slices=6, workers=1, tol=1E-10,
+                           full_output=True)
+        assert info['converged'] and info['iterations'] < 6, info['iterations']
+        assert np.max(np.abs(z - z_rk4)) < 1E-10*np.max(np.abs(z_rk4))
+        z, info = parareal(f3, 2.0, time, n_slices=6, workers=1, tol=0.0,
+                           full_output=True)
+        assert info['iterations'] == 6 and np.array_equal(z, z_rk4)
+        z, info = parareal(f3, 2.0, time, n_slices=3, workers=1, tol=0.0, max_iter=10,
+                           full_output=True)
+        assert info['iterations'] == 3 and info['converged'] and np.array_equal(z, z_rk4)
+
+    def test_fit_order():
+        """Check that fit_order recovers C and p of errors = C*h**p, and that
+        the two point fit solves the two equations."""
+        h = 0.1/2**np.arange(5)
+        errors = np.array([2.0*h, 3.0*h**2*(1 + h), 0.5*h**4])
+        C, p, info = fit_order(h, errors, full_output=True)
+        assert np.allclose(C[[0, 2]], [2.0, 0.5]) and np.allclose(p[[0, 2]], [1.0, 4.0])
+        assert abs(p[1] - 2.0) < 0.05 and info['p_stderr'][1] > 0 and info['asymptotic'].all()
+        C, p = fit_order(h, errors, points=2)
+        assert np.allclose(C*h[-2:, None]**p, errors[:, -2:].T)
+
+    def test_convergence_cache():
+        """Check that cached convergence runs are told apart by the values a
+        right hand side closes over, and that a closure over a value which
+        can not be hashed is only cached with an explicit key."""
+        import tempfile
+        from numpy import exp
+
+        saved = os.environ.get('ODESOLVERS_CACHE')
+        with tempfile.TemporaryDirectory() as directory:
+            os.environ['ODESOLVERS_CACHE'] = directory
+            try:
+                for a in [1.0, 3.0]:
+                    study = convergence_study(lambda z, t: -a*z, 1.0, 0, 1,
+                                              lambda t: exp(-a*t), [rk4], N0=10, levels=2,
+                                              workers=1)
+                    assert study.cached == 0 and study.errors[0, -1] < 1E-5, study.errors
+                study = convergence_study(lambda z, t: -a*z, 1.0, 0, 1, lambda t: exp(-a*t),
+                                          [rk4], N0=10, levels=2, workers=1)
+                assert study.cached == 3
+
+                lock = object()
+
+                def f_object(z, t):
+                    return -z if lock else z
+                try:
+                    convergence_study(f_object, 1.0, 0, 1, lambda t: exp(-t), [rk4], N0=10,
+                                      levels=1, workers=1)
+                    raise AssertionError('a closure over an object was cached')
+                except ValueError:
+                    pass
+                study = convergence_study(f_object, 1.0, 0, 1, lambda t: exp(-t), [rk4],
+                                          N0=10, levels=1, workers=1, key='lock')
+                assert study.computed == 2
+            finally:
+                if saved is None:
+                    del os.environ['ODESOLVERS_CACHE']
+                else:
+                    os.environ['ODESOLVERS_CACHE'] = saved
+
+    def test_shoot():
+        """Check the batched shooting method on the linear Couette-Poiseuille
+        problems, which converge after one secant update, and on the
+        nonlinear problem y'' = 3/2 y**2, y(0) = 4, y(1) = 1, with the
+        solution y = 4/(1 + x)**2."""
+        from numpy import linspace
+
+        def f_couette(z, t, dpdx, out):
+            out[:, 0] = z[:, 1]
+            out[:, 1] = -dpdx
+            return out
+
+        y = linspace(0, 1, 101)
+        dpdx = linspace(-5, 5, 50)
+        z, s, info = shoot(f_couette, [0.0, 0.0], y, 1.0, params=dpdx, inplace=True,
+                           full_output=True)
+        assert info['converged'].all() and info['shots'] == 2
+        u_a = y[:, None]*(1.0 + dpdx*(1.0 - y[:, None])/2.0)
+        assert np.max(np.abs(z[:, :, 0] - u_a)) < 1E-12
+
+        def f_nonlinear(z, t):
+            return np.column_stack([z[:, 1], 1.5*z[:, 0]**2])
+
+        x = linspace(0, 1, 401)
+        z, s, info = shoot(f_nonlinear, [4.0, 0.0], x, 1.0, guesses=([-7.0, -30.0], [-9.0, -40.0]),
+                           full_output=True)
+        assert info['converged'].all() and info['iterations'].max() > 1
+        assert abs(s[0] + 8.0) < 1E-6 and abs(s[1] + 35.858) < 1E-2, s
+        assert np.max(np.abs(z[:, 0, 0] - 4.0/(1 + x)**2)) < 1E-6
+
+    def test_bvp():
+        """Check the finite difference solver: exact for the quadratic
+        Couette-Poiseuille profiles, a batch equals the single solves, and
+        second order with a Neumann end for u'' = 6x, u'(0) = 0, u(1) = 1,
+        u = x**3."""
+        from numpy import linspace
+
+        y = linspace(0, 1, 201)
+        dpdx = linspace(-5, 5, 50)
+        bvp = TridiagonalBVP(y)
+        u = bvp.solve(-dpdx*np.ones((y.size, 1)), 0.0, 1.0)
+        u_a = y[:, None]*(1.0 + dpdx*(1.0 - y[:, None])/2.0)
+        assert u.shape == (y.size, dpdx.size) and np.max(np.abs(u - u_a)) < 1E-11
+        assert np.array_equal(bvp.solve(-dpdx[3], 0.0, 1.0), u[:, 3])
+
+        errors = []
+        for N in [20, 40, 80]:
+            x = linspace(0, 1, N + 1)
+            u = TridiagonalBVP(x, left='neumann').solve(6*x, 0.0, 1.0)
+            errors.append(np.max(np.abs(u - x**3)))
+        orders = np.log2(np.array(errors[:-1])/errors[1:])
+        assert np.all(np.abs(orders - 2) < 0.1), orders
+
+    def test_checkpoint():
+        """Check that a run interrupted by an exception in func continues
+        from its last checkpoint with the same result, bit for bit, as an
+        uninterrupted run, for schemes which carry state between steps, and
+        that a checkpoint of other options is not resumed."""
+        import tempfile
+        from numpy import linspace
+
+        class Interrupt(Exception):
+            pass
+
+        def f(z, t):
+            return np.array([z[1], -np.sin(z[0]) + noise*rng.standard_normal()])
+
+        time = linspace(0, 10, 501)
+        # a random force is restored with the state of rng (also of a bit
+        # generator whose state holds arrays); Newton needs a smooth f
+        def generator(seed, bit_generator=np.random.PCG64):
+            return np.random.Generator(bit_generator(seed))
+
+        for scheme, noise, bits in [(rk4, 0.01, np.random.PCG64),
+                                    (rk4, 0.01, np.random.MT19937),
+                                    (adams_moulton, 0.01, np.random.PCG64),
+                                    (verlet, 0.01, np.random.PCG64), (bdf2, 0.0, np.random.PCG64)]:
+            rng = generator(1, bits)
+            z_ref = scheme(f, [1.0, 0.0], time)
+            with tempfile.TemporaryDirectory() as directory:
+                filename = os.path.join(directory, 'run.npz')
+                rng = generator(1, bits)
+                calls = [0]
+
+                def f_crash(z, t):
+                    calls[0] += 1
+                    if calls[0] == 700:
+                        raise Interrupt()
+                    return f(z, t)
+
+                try:
+                    checkpointed(scheme, f_crash, [1.0, 0.0], time, filename, every=37,
+                                 rng=rng)
+                except Interrupt:
+                    pass
+                rng = generator(12345, bits)           # the checkpoint restores it
+                z, info = checkpointed(scheme, f, [1.0, 0.0], time, filename, every=37,
+                                       rng=rng, full_output=True)
+                assert info['resumed_from'] > 0
+                assert np.array_equal(z, z_ref), scheme.__name__
+
+        # the options of the stepper are part of the identity of a run
+        noise = 0.0
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'run.npz')
+            checkpointed(adams_bashforth, f, [1.0, 0.0], time, filename, order=4)
+            try:
+                checkpointed(adams_bashforth, f, [1.0, 0.0], time, filename, order=2)
+                raise AssertionError('a checkpoint of order 4 was resumed with order 2')
+            except ValueError:
+                pass
+
+    def test_dtype():
+        """Check that float32 runs keep float32 states and that float64
+        accumulation of the updates reduces their round-off error, also when
+        terminal events freeze members of an ensemble."""
+        import tempfile
+        from numpy import linspace
+        from odesolvers import RK4Stepper
+
+        time = linspace(0, 1.5, 3001)
+        z0 = np.linspace(0.5, 2.0, 5).reshape(-1, 1)
+        exact = u_nonlin_analytical(z0[:, 0], time[-1])
+        for scheme in [euler, heun, rk4]:
+            z64 = scheme(f3, z0, time)
+            z32 = scheme(f3, z0, time, dtype=np.float32)
+            z32acc = scheme(f3, z0, time, dtype=np.float32, accumulate=True)
+            assert z32.dtype == np.float32 and z32acc.dtype == np.float32
+            error32 = np.max(np.abs(z32[-1, :, 0] - z64[-1, :, 0])/exact)
+            error32acc = np.max(np.abs(z32acc[-1, :, 0] - z64[-1, :, 0])/exact)
+            assert error32acc < error32 < 1E-3, (scheme.__name__, error32, error32acc)
+
+        # the multistep and symplectic schemes, stream, NpySink and
+        # checkpointed keep float32 too; the implicit schemes refuse it
+        def oscillator(z, t):
+            return np.concatenate([z[..., 1:], -z[..., :1]], axis=-1)
+
+        time = linspace(0, 1.5, 301)
+        for scheme, func, z0s in [(adams_bashforth, f3, z0), (adams_moulton, f3, z0),
+                                  (symplectic_euler, oscillator, [[1.0, 0.0], [0.5, 0.5]]),
+                                  (verlet, oscillator, [[1.0, 0.0], [0.5, 0.5]]),
+                                  (yoshida4, oscillator, [[1.0, 0.0], [0.5, 0.5]])]:
+            z32 = scheme(func, z0s, time, dtype=np.float32)
+            assert z32.dtype == np.float32, scheme.__name__
+            z64 = scheme(func, z0s, time)
+            assert np.allclose(z32, z64, rtol=1E-4, atol=1E-5), scheme.__name__
+
+        z32 = rk4(f3, z0, time, dtype=np.float32, accumulate=True)
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'z.npy')
+            sink = NpySink(filename, time, z0, dtype=np.float32)
+            run_to_sink(sink, 'rk4', f3, z0, time, chunk_size=64, dtype=np.float32,
+                        accumulate=True)
+            z = np.load(filename)
+            assert z.dtype == np.float32 and np.array_equal(z, z32)
+            filename = os.path.join(directory, 'run.npz')
+            for resume in [False, True]:
+                z = checkpointed(rk4, f3, z0, time, filename, every=100,
+                                 dtype=np.float32, accumulate=True)
+                assert z.dtype == np.float32 and np.array_equal(z, z32), resume
+        for scheme, options in [(bdf2, {'dtype': np.float32}), (verlet, {'accumulate': True})]:
+            try:
+                next(stream(scheme, oscillator, [1.0, 0.0], time, **options))
+                raise AssertionError('%s accepted %s' % (scheme.__name__, options))
+            except ValueError:
+                pass
+
+        # a state changed by the driver between steps (members frozen at a
+        # terminal event) is taken over into the float64 state
+        def grow(z, t):
+            return 100.0*z
+
+        stepper = RK4Stepper(rhs_inplace(grow), (2, 1), np.float32, accumulate=True)
+        z = np.ones((3, 2, 1), dtype=np.float32)
+        stepper.step(z[0], 0.0, 0.001, z[1])
+        z[1, 0] = 1.0
+        stepper.step(z[1], 0.001, 0.001, z[2])
+        assert z[2, 0, 0] == z[1, 1, 0] and z[2, 1, 0] > z[1, 1, 0], z[:, :, 0]
+
+        def threshold(z, t):
+            return z[:, 0] - 1E3
+
+        threshold.terminal = True
+        threshold.direction = 1
+        z0 = np.array([[1.0], [1E-30]])
+        z, info = rk4(grow, z0, linspace(0, 1.5, 1501), events=threshold,
+                      full_output=True, dtype=np.float32, accumulate=True)
+        assert np.all(np.isfinite(z)) and np.allclose(z[-1, :, 0], 1E3, rtol=1E-5), z[-1]
+        assert np.array_equal(z[-1, info['member_events'][0]],
+                              info['z_events'][0].astype(np.float32))
+
+    def test_mms():
+        """Check the right hand side of a manufactured solution against the
+        hand written one, with and without the precomputed source term, and
+        that rk4 converges to the manufactured solution."""
+        import pickle
+        from numpy import linspace
+        from sympy import symbols, sin, cos
+
+        t = symbols('t')
+        mms = ManufacturedSolution(sin(t), lambda u, t: u.diff(t, 2) + u**3, t, cache=False)
+        assert mms.order == 2
+        time = linspace(0, 2.0, 41)
+        func = mms.rhs(time, [rk4])
+        z = np.array([0.3, -0.2])
+        for s in [0.1, 0.15, 0.2, 0.123]:
+            g = -np.sin(s) + np.sin(s)**3
+            assert np.allclose(func(z, s), [z[1], g - z[0]**3])
+        assert len(func.table) <= 3*40 + 1 and time[0] + (time[1] - time[0])/2.0 in func.table
+        assert np.allclose(mms.state(time), np.column_stack([np.sin(time), np.cos(time)]))
+        assert np.array_equal(pickle.loads(pickle.dumps(func))(z, 0.15), func(z, 0.15))
+        error = np.max(np.abs(rk4(func, mms.state(0.0), time, inplace=True)[:, 0] -
+                              mms.exact(time)))
+        assert error < 1E-6, error
+
     # f3 defines an ODE with analytical solution in u_nonlin_analytical
     def f3(z, t, a=2.0, b=-1.0):
         """ """
@@ -135,33 +645,25 @@ if __name__ == '__main__':
         legends = []
         schemes_order = {}
 
+        # all runs at once, on a process pool and cached on disk
+        study = convergence_study(f3, z0, 0, T, lambda t: u_nonlin_analytical(z0, t),
+                                  schemes, N0=30, levels=Ndts)
+
         colors = ['r', 'g', 'b', 'm', 'k', 'y', 'c']
         linestyles = ['-', '--', '-.', ':', 'v--', '*-.']
         iclr = 0
-        for scheme in schemes:
-            N = 30    # no of time steps
-            time = linspace(0, T, N+1)
-
-            order_approx = []
-
-            for i in range(Ndts+1):
-                z = scheme(f3, z0, time)
+        for k, scheme in enumerate(schemes):
+            for i, N in enumerate(study.N):
+                time = linspace(0, T, N+1)
+                z = study.z[scheme.__name__, N]
                 abs_error = abs(u_nonlin_analytical(z0, time)-z[:, 0])
                 # Drop 1st elt to avoid log2-problems (1st elt is zero)
                 log_error = log2(abs_error[1:])
-                max_log_err = max(log_error)
                 plot(time[1:], log_error, linestyles[i] +
-                     colors[iclr], markevery=N/5)
+                     colors[iclr], markevery=N//5)
                 legends.append(scheme.__name__ + ': N = ' + str(N))
 
-                if i > 0:  # Compute the log2 error difference
-                    order_approx.append(previous_max_log_err - max_log_err)
-                previous_max_log_err = max_log_err
-
-                N *= 2
-                time = linspace(0, T, N+1)
-
-            schemes_order[scheme.__name__] = order_approx
+            schemes_order[scheme.__name__] = study.orders[k, 1:]
             iclr += 1
 
         legend(legends, loc='best')
@@ -169,9 +671,8 @@ if __name__ == '__main__':
         ylabel('log(error)')
         grid()
 
-        N = N/2**Ndts
-        N_list = [N*2**i for i in range(1, Ndts+1)]
-        N_list = np.asarray(N_list)
+        N = study.N[0]
+        N_list = study.N[1:]
 
         figure()
         for key in schemes_order:
@@ -400,68 +901,16 @@ if __name__ == '__main__':
         setp(ax, xticks=[-1.5, 0.5,  2.5], yticks=[0.0, 0.4, 0.8, 1.2])
 
 #        #savefig('../figs/normal_distribution_refinement.png')
-        def Newton_solver_sympy(error, h, x0):
-            """ Function that solves for the nonlinear set of equations
-                error1 = C*h1^p --> f1 = C*h1^p - error1 = 0
-                error2 = C*h2^p --> f2 = C h2^p - error 2 = 0
-                where C is a constant h is the step length and p is the order,
-                with use of a newton rhapson solver. In this case C and p are
-                the unknowns, whereas h and error are knowns. The newton rhapson 
-                method is an iterative solver which take the form:
-                xnew = xold - (J^-1)*F, where J is the Jacobi matrix and F is the 
-                residual funcion.
-                    x = [C, p]^T
-                    J = [[df1/dx1  df2/dx2],
-                         [df2/dx1  df2/dx2]]
-                    F = [f1, f2]
-                This is very neatly done with use of the sympy module
-
-                Args:
-                    error(list): list of calculated errors [error(h1), error(h2)]
-                    h(list): list of steplengths corresponding to the list of errors
-                    x0(list): list of starting (guessed) values for x
-
-                Returns:
-                    x(array): iterated solution of x = [C, p]
-
-            """
-            from sympy import Matrix
-            #### Symbolic computiations: ####
-            C, p = symbols('C p')
-            f1 = C*h[-2]**p - error[-2]
-            f2 = C*h[-1]**p - error[-1]
-            F = [f1, f2]
-            x = [C, p]
-
-            def jacobiElement(i, j):
-                return diff(F[i], x[j])
-
-            # neat way of computing the Jacobi Matrix
-            Jacobi = Matrix(2, 2, jacobiElement)
-            JacobiInv = Jacobi.inv()
-            #### Numerical computations: ####
-            JacobiInvfunc = lambdify([x], JacobiInv)
-            Ffunc = lambdify([x], F)
-            x = x0
-
-            for n in range(8):  # perform 8 iterations
-                F = np.asarray(Ffunc(x))
-                Jinv = np.asarray(JacobiInvfunc(x))
-                xnew = x - np.dot(Jinv, F)
-                x = xnew
-                # print "n, x: ", n, x
-            x[0] = round(x[0], 2)
-            x[1] = round(x[1], 3)
-            return x
 
         ht = np.asarray(h)
         eulerError = np.asarray(schemes_error["euler"])
         heunError = np.asarray(schemes_error["heun"])
         rk4Error = np.asarray(schemes_error["rk4"])
 
-        [C_euler, p_euler] = Newton_solver_sympy(eulerError, ht, [1, 1])
-        [C_heun, p_heun] = Newton_solver_sympy(heunError, ht, [1, 2])
-        [C_rk4, p_rk4] = Newton_solver_sympy(rk4Error, ht, [1, 4])
+        # error = C*h^p through the two finest levels, for all schemes at once
+        C, p = fit_order(ht, [eulerError, heunError, rk4Error], points=2)
+        [C_euler, C_heun, C_rk4] = np.round(C, 2)
+        [p_euler, p_heun, p_rk4] = np.round(p, 3)
 
         from sympy import latex
         h = symbols('h')
@@ -524,6 +973,24 @@ if __name__ == '__main__':
 
     manufactured_solution_Nonlinear()
     # test_ODEschemes()
+    # test_ensemble()
+    # test_dopri45()
+    # test_stream()
+    # test_implicit()
+    # test_events()
+    # test_dense_output()
+    # test_stats()
+    # test_fsal()
+    # test_multistep()
+    # test_symplectic()
+    # test_parareal()
+    # test_fit_order()
+    # test_convergence_cache()
+    # test_shoot()
+    # test_bvp()
+    # test_checkpoint()
+    # test_dtype()
+    # test_mms()
     # convergence_test()
     # plot_ODEschemes_solutions()
     # manufactured_solution()
@@ -1,7 +1,6 @@
-# src-ch1/ParticleMotion2D.py;DragCoefficientGeneric.py @ git@lrhgit/tkt4140/src/src-ch1/DragCoefficientGeneric.py;cdclgolfball.py @ git@lrhgit/tkt4140/src/src-ch1/cdclgolfball.py;ODEschemes.py @ git@lrhgit/tkt4140/src/src-ch1/ODEschemes.py;
+# src-ch1/ParticleMotion2D.py;ParticleMotion2DBatch.py @ git@lrhgit/tkt4140/src/src-ch1/ParticleMotion2DBatch.py;DragCoefficientGeneric.py @ git@lrhgit/tkt4140/src/src-ch1/DragCoefficientGeneric.py;cdclgolfball.py @ git@lrhgit/tkt4140/src/src-ch1/cdclgolfball.py;ODEschemes.py @ git@lrhgit/tkt4140/src/src-ch1/ODEschemes.py;
 
-from DragCoefficientGeneric import cd_sphere
-from cdclgolfball import cdcl
+from ParticleMotion2DBatch import BallRHS, hit_ground, launch_states
 from matplotlib.pyplot import *
 import numpy as np
 from ODEschemes import rk4
@@ -17,50 +16,13 @@ vfy = 0.0     # y-component of fluid's velocity
 
 nrpm = 3500   # no of rpm of golf ball
 
-# smooth ball
-
-
-def f(z, t):
-    """4x4 system for smooth sphere with drag in two directions."""
-    zout = np.zeros_like(z)
-    C = 3.0*rho_f/(4.0*rho_s*d)
-    vrx = z[2] - vfx
-    vry = z[3] - vfy
-    vr = np.sqrt(vrx**2 + vry**2)
-    Re = vr*d/nu
-    CD = cd_sphere(Re)  # using the already defined function
-    zout[:] = [z[2], z[3], -C*vr*(CD*vrx), C*vr*(-CD*vry) - g]
-    return zout
-
-# golf ball without lift
-
-
-def f2(z, t):
-    """4x4 system for golf ball with drag in two directions."""
-    zout = np.zeros_like(z)
-    C = 3.0*rho_f/(4.0*rho_s*d)
-    vrx = z[2] - vfx
-    vry = z[3] - vfy
-    vr = np.sqrt(vrx**2 + vry**2)
-    Re = vr*d/nu
-    CD, CL = cdcl(vr, nrpm)
-    zout[:] = [z[2], z[3], -C*vr*(CD*vrx), C*vr*(-CD*vry) - g]
-    return zout
-
-# golf ball with lift
-
-
-def f3(z, t):
-    """4x4 system for golf ball with drag and lift in two directions."""
-    zout = np.zeros_like(z)
-    C = 3.0*rho_f/(4.0*rho_s*d)
-    vrx = z[2] - vfx
-    vry = z[3] - vfy
-    vr = np.sqrt(vrx**2 + vry**2)
-    Re = vr*d/nu
-    CD, CL = cdcl(vr, nrpm)
-    zout[:] = [z[2], z[3], -C*vr*(CD*vrx + CL*vry), C*vr*(CL*vrx - CD*vry) - g]
-    return zout
+# right hand sides for a batch of balls (see ParticleMotion2DBatch.BallRHS):
+# f: smooth ball, f2: golf ball without lift, f3: golf ball with lift
+f = BallRHS('smooth', d=d, nrpm=nrpm, rho_s=rho_s, vfx=vfx, vfy=vfy, rho_f=rho_f, nu=nu, g=g)
+f2 = BallRHS('drag', d=d, nrpm=nrpm, rho_s=rho_s, vfx=vfx, vfy=vfy, rho_f=rho_f, nu=nu, g=g,
+             policy='raise')
+f3 = BallRHS('lift', d=d, nrpm=nrpm, rho_s=rho_s, vfx=vfx, vfy=vfy, rho_f=rho_f, nu=nu, g=g,
+             policy='raise')
 
 
 # main program starts here
@@ -71,7 +33,6 @@ time = np.linspace(0, T, N+1)
 
 N2 = 4
 alfa = np.linspace(30, 15, N2)   # Angle of elevation [degrees]
-angle = alfa*np.pi/180.0  # convert to radians
 
 legends = []
 line_color = ['k', 'm', 'b', 'r']
@@ -82,37 +43,17 @@ FNT = 18
 rcParams['lines.linewidth'] = LNWDT
 rcParams['font.size'] = FNT
 
-# computing and plotting
-
-# smooth ball with drag
-for i in range(0, N2):
-    z0 = np.zeros(4)
-    z0[2] = v0*np.cos(angle[i])
-    z0[3] = v0*np.sin(angle[i])
-
-    z = rk4(f, z0, time)
-    plot(z[:, 0], z[:, 1], ':', color=line_color[i])
-    legends.append('angle='+str(alfa[i])+', smooth ball')
-
-# golf ball with drag
-for i in range(0, N2):
-    z0 = np.zeros(4)
-    z0[2] = v0*np.cos(angle[i])
-    z0[3] = v0*np.sin(angle[i])
-
-    z = rk4(f2, z0, time)
-    plot(z[:, 0], z[:, 1], '-.', color=line_color[i])
-    legends.append('angle='+str(alfa[i])+', golf ball')
-
-# golf ball with drag and lift
-for i in range(0, N2):
-    z0 = np.zeros(4)
-    z0[2] = v0*np.cos(angle[i])
-    z0[3] = v0*np.sin(angle[i])
-
-    z = rk4(f3, z0, time)
-    plot(z[:, 0], z[:, 1], '.', color=line_color[i])
-    legends.append('angle='+str(alfa[i])+', golf ball (with lift)')
+# computing and plotting: all angles of a ball as one ensemble, each
+# ball stops when it lands
+
+z0 = launch_states(v0, alfa)
+for rhs, style, name in [(f, ':', 'smooth ball'), (f2, '-.', 'golf ball'),
+                         (f3, '.', 'golf ball (with lift)')]:
+    z = rk4(rhs, z0, time, inplace=True, events=hit_ground)
+    for i in range(0, N2):
+        landed = np.flatnonzero(np.all(z[:, i] == z[-1, i], axis=1))[0]
+        plot(z[:landed+1, i, 0], z[:landed+1, i, 1], style, color=line_color[i])
+        legends.append('angle='+str(alfa[i])+', '+name)
 
 legend(legends, loc='best', frameon=False)
 xlabel('x [m]')
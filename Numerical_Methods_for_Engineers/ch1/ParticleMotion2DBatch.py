@@ -0,0 +1,131 @@
+# src-ch1/ParticleMotion2DBatch.py;DragCoefficientGeneric.py @ git@lrhgit/tkt4140/src/src-ch1/DragCoefficientGeneric.py;cdclgolfball.py @ git@lrhgit/tkt4140/src/src-ch1/cdclgolfball.py;ODEschemes.py @ git@lrhgit/tkt4140/src/src-ch1/ODEschemes.py;
+
+# The right hand sides of ParticleMotion2D for a batch of balls, which are
+# integrated as one ensemble: the state z is an (n_balls, 4) array with the
+# rows [x, y, vx, vy], and the ball and wind parameters may differ per ball.
+
+import numpy as np
+from DragCoefficientGeneric import cd_sphere_table
+from cdclgolfball import cdcl_interpolator
+
+MODELS = ('smooth', 'drag', 'lift')
+
+
+class BallRHS(object):
+    """Right hand side f(z, t, out=None) of the 4x4 systems of ParticleMotion2D
+    for the states z of many balls at once, z[..., :] = [x, y, vx, vy]:
+        'smooth': smooth sphere with drag, CD = cd_sphere(Re)      (f)
+        'drag':   golf ball with drag, CD = cdcl(vr, nrpm)         (f2)
+        'lift':   golf ball with drag and lift, CD, CL = cdcl(...) (f3)
+    The diameter d, the spin nrpm, the density rho_s and the fluid velocity
+    (vfx, vfy) are scalars or arrays with one value per ball (one row of
+    z). CD (and CL) of all balls are evaluated in one call, with the lookup
+    table of cd_sphere or the interpolator of cdclgolfball. Outside the
+    golf ball data the coefficients follow policy (see CdClInterpolator);
+    the default 'clamp' keeps one slow ball from stopping the whole batch.
+
+    The work arrays are allocated on the first call, so with out given
+    (inplace=True in ODEschemes) a step allocates little."""
+
+    def __init__(self, model='lift', d=41.0e-3, nrpm=3500, rho_s=1275, vfx=0.0, vfy=0.0,
+                 rho_f=1.20, nu=1.5e-5, g=9.81, policy='clamp'):
+        if model not in MODELS:
+            raise ValueError('model must be one of %s, got %r' % (MODELS, model))
+        self.model, self.policy = model, policy
+        self.d, self.nrpm, self.rho_s, self.vfx, self.vfy = [
+            np.asarray(p, dtype=float) for p in (d, nrpm, rho_s, vfx, vfy)]
+        self.nu, self.g = nu, g
+        self.C = 3.0*rho_f/(4.0*self.rho_s*self.d)
+        self.shape = None
+
+    def _allocate(self, shape):
+        self.shape = shape
+        self.vrx, self.vry, self.vr, self.k = [np.empty(shape) for i in range(4)]
+        self.coefficients = np.zeros((2,) + shape)     # CD, CL
+
+    def __call__(self, z, t, out=None):
+        zout = np.empty_like(z) if out is None else out
+        if z.shape[:-1] != self.shape:
+            self._allocate(z.shape[:-1])
+        vrx, vry, vr, k = self.vrx, self.vry, self.vr, self.k
+        np.subtract(z[..., 2], self.vfx, out=vrx)
+        np.subtract(z[..., 3], self.vfy, out=vry)
+        np.hypot(vrx, vry, out=vr)
+        CD, CL = self.coefficients[0, ...], self.coefficients[1, ...]
+        if self.model == 'smooth':
+            np.multiply(vr, self.d/self.nu, out=k)      # Re
+            cd_sphere_table.vector(k, out=CD)
+        else:
+            cdcl_interpolator(vr, self.nrpm, out=self.coefficients, policy=self.policy)
+            if self.model == 'drag':
+                CL[...] = 0.0
+        np.multiply(vr, self.C, out=k)
+        zout[..., 0] = z[..., 2]
+        zout[..., 1] = z[..., 3]
+        ax, ay = zout[..., 2], zout[..., 3]
+        np.multiply(CD, vrx, out=ax)                    # -k*(CD*vrx + CL*vry)
+        ax += CL*vry
+        ax *= k
+        np.negative(ax, out=ax)
+        np.multiply(CL, vrx, out=ay)                    # k*(CL*vrx - CD*vry) - g
+        ay -= CD*vry
+        ay *= k
+        ay -= self.g
+        return zout
+
+
+def hit_ground(z, t):
+    """Event function which stops each ball when it lands."""
+    return z[..., 1]
+
+
+hit_ground.terminal = True
+hit_ground.direction = -1
+
+
+def launch_states(v0, angle):
+    """Initial states [0, 0, vx, vy] of balls launched with the speeds v0
+    [m/s] at the angles of elevation angle [degrees] (broadcast)."""
+    v0, angle = np.broadcast_arrays(np.asarray(v0, dtype=float),
+                                    np.radians(np.asarray(angle, dtype=float)))
+    z0 = np.zeros(v0.shape + (4,))
+    z0[..., 2] = v0*np.cos(angle)
+    z0[..., 3] = v0*np.sin(angle)
+    return z0
+
+
+def carry(z):
+    """Landing distance x of each ball of the solution z of an ensemble
+    stopped by hit_ground (the last row holds the frozen landing states)."""
+    return z[-1, ..., 0]
+
+
+if __name__ == '__main__':
+    # sweep over launch speed x angle x spin, all trajectories as one ensemble
+    import time as timer
+    from ODEschemes import rk4
+
+    speeds = np.linspace(40, 70, 16)
+    angles = np.linspace(8, 30, 23)
+    spins = np.linspace(2000, 6000, 21)
+    V, A, S = [x.ravel() for x in np.meshgrid(speeds, angles, spins, indexing='ij')]
+    time = np.linspace(0, 10, 201)
+    f = BallRHS('lift', nrpm=S)
+    tic = timer.perf_counter()
+    z = rk4(f, launch_states(V, A), time, inplace=True, events=hit_ground)
+    seconds = timer.perf_counter() - tic
+    x = carry(z)
+    print('%d trajectories in %.2f s (%.1f us per trajectory)'
+          % (V.size, seconds, 1e6*seconds/V.size))
+    best = np.argmax(x)
+    print('longest carry %.1f m: v0 = %.1f m/s, angle = %.1f deg, nrpm = %d'
+          % (x[best], V[best], A[best], S[best]))
+
+    # the same balls one at a time, as in ParticleMotion2D
+    m = 20
+    tic = timer.perf_counter()
+    x1 = [carry(rk4(BallRHS('lift', nrpm=S[i]), launch_states(V[i], A[i]), time,
+                    inplace=True, events=hit_ground)) for i in range(m)]
+    seconds1 = (timer.perf_counter() - tic)/m
+    print('one at a time: %.1f us per trajectory, max difference %.2e m'
+          % (1e6*seconds1, np.max(np.abs(np.array(x1) - x[:m]))))
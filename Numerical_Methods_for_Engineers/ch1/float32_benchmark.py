@@ -0,0 +1,135 @@
+# src-ch1/float32_benchmark.py;ODEschemes.py @ git@lrhgit/tkt4140/src/src-ch1/ODEschemes.py;
+
+# Throughput and accuracy of float32 states (dtype=np.float32), with and without
+# float64 accumulation of the update (accumulate=True), against float64 for test
+# cases with analytical solutions: an ensemble of the linear ODE of u_nonlin_analytical,
+# an ensemble of falling spheres with constant drag, v_a = k1*tanh(k2*t), and the
+# explicit (FTCS) diffusion loop of Advection-Diffusion-Equation/ADE.ipynb.
+
+import time as timer
+import numpy as np
+from ODEschemes import rk4
+
+repeat = 3  # the best of repeat runs is reported
+
+
+def best_time(run):
+    times = []
+    for i in range(repeat):
+        tic = timer.perf_counter()
+        result = run()
+        times.append(timer.perf_counter() - tic)
+    return min(times), result
+
+
+def report(case, runs, work):
+    """Print run time, throughput (work units per second) and largest error
+    of each run (name, seconds, error) relative to the first one."""
+    print(case)
+    t_ref = runs[0][1]
+    for name, seconds, error in runs:
+        print('    %-26s %8.3f s %10.3e /s  speedup %5.2f  max error %.3e'
+              % (name, seconds, work/seconds, t_ref/seconds, error))
+
+
+modes = [('float64', np.float64, False), ('float32', np.float32, False),
+         ('float32, float64 update', np.float32, True)]
+
+#### ensemble of u' = a*u + b, u(0) = u0 ####
+a, b = 2.0, -1.0
+
+
+def f3(z, t, out):
+    np.multiply(z, a, out=out)
+    out += b
+    return out
+
+
+def u_nonlin_analytical(u0, t):
+    return (u0 + b/a)*np.exp(a*t) - b/a
+
+
+members = 200000
+time = np.linspace(0, 1.5, 151)
+u0 = np.linspace(0.5, 2.0, members).reshape(-1, 1)
+exact = u_nonlin_analytical(u0[:, 0], time[:, None])
+runs = []
+for name, dtype, accumulate in modes:
+    seconds, z = best_time(lambda: rk4(f3, u0, time, inplace=True, dtype=dtype,
+                                       accumulate=accumulate))
+    runs.append((name, seconds, np.max(np.abs(z[:, :, 0] - exact)/np.abs(exact))))
+report('rk4, %d members of u\' = a*u + b (relative error), member steps:' % members,
+       runs, members*(time.size - 1))
+
+#### ensemble of falling spheres with constant drag ####
+g = 9.81      # Gravity m/s^2
+d = 41.0e-3   # Diameter of the sphere
+rho_f = 1.22  # Density of fluid [kg/m^3]
+rho_s = 1275  # Density of sphere [kg/m^3]
+CD = np.linspace(0.2, 0.6, members)
+alpha = 3.0*rho_f/(4.0*rho_s*d)*CD
+
+
+def f(z, t, out):
+    """2x2 system for spheres with constant drag, one row per sphere"""
+    out[:, 0] = z[:, 1]
+    np.multiply(z[:, 1], z[:, 1], out=out[:, 1])
+    out[:, 1] *= -alpha_t
+    out[:, 1] += g
+    return out
+
+
+time = np.linspace(0, 10, 201)
+k1 = np.sqrt(g*4*rho_s*d/(3*rho_f*CD))
+k2 = np.sqrt(3*rho_f*g*CD/(4*rho_s*d))
+v_a = k1*np.tanh(k2*time[:, None])
+runs = []
+for name, dtype, accumulate in modes:
+    alpha_t = alpha.astype(dtype)
+    z0 = np.zeros((members, 2))
+    seconds, z = best_time(lambda: rk4(f, z0, time, inplace=True, dtype=dtype,
+                                       accumulate=accumulate))
+    runs.append((name, seconds, np.max(np.abs(z[:, :, 1] - v_a))))
+report('rk4, %d falling spheres (error in v [m/s]), member steps:' % members,
+       runs, members*(time.size - 1))
+
+#### explicit diffusion loop (FTCS) of ADE.ipynb on a fine grid ####
+h = 0.0005              # space step
+x = np.arange(0, 1+h, h)  # space domain
+kappa = 1.0             # diffusion coefficient
+beta = 100
+k = 0.5*h**2/kappa      # time step, k <= 1/2 * h^2 / kappa
+N = 2000                # total number of time steps
+
+
+def eta(x):
+    return np.exp(-beta*(x-0.5)**2)
+
+
+def utrue(x, t):
+    return 1.0/np.sqrt(4*beta*kappa*t + 1)*np.exp(-(x-0.5)**2/(4*kappa*t + 1/beta))
+
+
+def ftcs(dtype):
+    """The vectorized loop of ADE.ipynb with the arrays in dtype"""
+    uold = eta(x).astype(dtype)
+    unew = np.zeros_like(uold)
+    r = dtype(kappa*k/h**2)
+    for n in range(1, N):
+        t = n*k
+        unew[0] = utrue(x[0], t)
+        unew[-1] = utrue(x[-1], t)
+        np.subtract(uold[:-2], 2*uold[1:-1], out=unew[1:-1])
+        unew[1:-1] += uold[2:]
+        unew[1:-1] *= r
+        unew[1:-1] += uold[1:-1]
+        uold, unew = unew, uold
+    return uold
+
+
+runs = []
+for name, dtype in [('float64', np.float64), ('float32', np.float32)]:
+    seconds, u = best_time(lambda: ftcs(dtype))
+    runs.append((name, seconds, np.max(np.abs(u - utrue(x, (N - 1)*k)))))
+report('FTCS diffusion, %d points, %d steps (error against utrue), point updates:'
+       % (x.size, N), runs, x.size*(N - 1))
@@ -0,0 +1,38 @@
+# src-ch1/parareal_pendulum.py;ODEschemes.py @ git@lrhgit/tkt4140/src/src-ch1/ODEschemes.py;
+
+import os
+import numpy as np
+from math import pi
+from ODEschemes import parareal
+
+
+def pendulum_func(y, t):
+    """ function that returns the RHS of the nonlinear pendulum ODE:
+        y0' = y1
+        y1' = -sin(y0)
+
+        It is defined at module level, so that it can be sent to the worker
+        processes of parareal.
+        """
+
+    dy = np.zeros_like(y)
+    dy[:] = [y[1], -np.sin(y[0])]
+    return dy
+
+
+# the worker processes import this script, so the run must be guarded
+if __name__ == '__main__':
+    periods = 100
+    N = 400*periods
+    time = np.linspace(0, periods*2*pi, N + 1)
+    theta_0 = [1.0, 0]
+    workers = os.cpu_count() or 1
+
+    for n_slices in [workers, 2*workers, 4*workers]:
+        theta, info = parareal(pendulum_func, theta_0, time, n_slices=n_slices,
+                               workers=workers, serial=True, full_output=True)
+        print('%d workers, %3d slices: %d iterations (converged: %s), parareal %.2f s, '
+              'serial rk4 %.2f s, speedup %.2f, difference %.2e'
+              % (workers, len(info['bounds']) - 1, info['iterations'], info['converged'],
+                 info['time_parareal'], info['time_serial'], info['speedup'],
+                 info['error_serial']))
@@ -0,0 +1,67 @@
+# src-ch1/symplectic_pendulum.py;ODEschemes.py @ git@lrhgit/tkt4140/src/src-ch1/ODEschemes.py;
+
+from ODEschemes import euler, rk4, symplectic_euler, verlet, yoshida4, SolverStats
+from matplotlib.pyplot import *
+import numpy as np
+from math import pi
+
+# change some default values to make plots more readable
+LNWDT = 2
+FNT = 11
+rcParams['lines.linewidth'] = LNWDT
+rcParams['font.size'] = FNT
+
+
+def pendulum_func(y, t):
+    """ function that returns the RHS of the nonlinear pendulum ODE:
+        theta'' = - sin(theta)
+
+        y0' = y1
+        y1' = -sin(y0)
+
+        The system is separable with q = y0 = theta and p = y1 = theta',
+        as the symplectic schemes require.
+
+        Args:
+            y(array): array [y0, y1] at time t
+            t(float): current time
+
+        Returns:
+            dy(array): [y0', y1'] = [y1, -sin(y0)]
+        """
+
+    dy = np.zeros_like(y)
+    dy[:] = [y[1], -np.sin(y[0])]
+    return dy
+
+
+def energy(y):
+    """Energy of the pendulum per unit mass and length (g/L = 1)."""
+    return 0.5*y[:, 1]**2 + 1.0 - np.cos(y[:, 0])
+
+
+periods = 50
+theta_0 = [1.0, 0]
+
+# rk4 and yoshida4 with the same number of evaluations of the right hand side
+# per period; the symplectic schemes with 5 times larger time steps than euler
+schemes = [(euler, 100), (symplectic_euler, 20), (verlet, 20), (yoshida4, 10), (rk4, 15)]
+
+figure()
+legends = []
+for scheme, steps_per_period in schemes:
+    N = periods*steps_per_period
+    time = np.linspace(0, periods*2*pi, N + 1)
+    stats = SolverStats()
+    theta = scheme(pendulum_func, theta_0, time, stats=stats)
+    E = energy(theta)
+    plot(time/(2*pi), E/E[0] - 1.0)
+    legends.append('%s, dt = %.3g, %d evaluations' % (scheme.__name__, time[1], stats.nfev))
+    print('%-16s max relative energy error %.3g' % (scheme.__name__, np.max(np.abs(E/E[0] - 1.0))))
+
+legend(legends, loc='best', frameon=False)
+xlabel(r'$t/2\pi$')
+ylabel('Relative energy error')
+ylim(-0.5, 0.5)
+grid()
+show()
@@ -0,0 +1,67 @@
+# src-ch2/Couette_Poiseuille_fd.py;ODEschemes.py @ git@lrhgit/tkt4140/src/src-ch2/ODEschemes.py;
+
+import time as timer
+from ODEschemes import shoot, TridiagonalBVP
+import numpy as np
+from matplotlib.pyplot import *
+
+# change some default values to make plots more readable
+LNWDT = 2
+FNT = 11
+rcParams['lines.linewidth'] = LNWDT
+rcParams['font.size'] = FNT
+
+# Couette-Poiseuille flow u'' = -dpdx, u(0) = 0, u(L) = beta, solved with central
+# differences instead of shooting; see Couette_Poiseuille_shoot.py
+
+N = 200
+L = 1.0
+y = np.linspace(0, L, N+1)
+beta = 1.0  # Boundary value at y = L
+
+
+def u_a(y, dpdx):
+    return y*(1.0 + dpdx*(1.0-y)/2.0)
+
+
+def f(z, t, dpdx, out):
+    """RHS for Couette-Posieulle flow, for shoot"""
+    out[:, 0] = z[:, 1]
+    out[:, 1] = -dpdx
+    return out
+
+
+# the tridiagonal matrix is factorized once; only the right hand side depends on dpdx
+bvp = TridiagonalBVP(y, left='dirichlet', right='dirichlet')
+
+dpdx_list = [-5.0, -2.5, -1.0, 0.0, 1.0, 2.5, 5.0]
+legends = []
+
+# one column of right hand side values for each pressure gradient, solved in one call
+u = bvp.solve(-np.outer(np.ones_like(y), dpdx_list), 0.0, beta)
+
+for m, dpdx in enumerate(dpdx_list):
+    plot(u[:, m], y, '-.')
+    legends.append('fd: dp='+str(dpdx))
+    plot(u_a(y, dpdx), y, ':')
+    legends.append('exa: dp='+str(dpdx))
+
+# compare with the batched shooting method for a sweep over many pressure gradients
+dpdx_sweep = np.linspace(-5.0, 5.0, 501)
+tic = timer.perf_counter()
+u = bvp.solve(-np.outer(np.ones_like(y), dpdx_sweep), 0.0, beta)
+time_fd = timer.perf_counter() - tic
+tic = timer.perf_counter()
+z, s = shoot(f, np.zeros(2), y, beta, params=dpdx_sweep, inplace=True)
+time_shoot = timer.perf_counter() - tic
+exact = u_a(y[:, None], dpdx_sweep)
+print('%d pressure gradients: finite differences %.2e s (max error %.2e), '
+      'shooting %.2e s (max error %.2e)'
+      % (dpdx_sweep.size, time_fd, np.max(np.abs(u - exact)), time_shoot,
+         np.max(np.abs(z[:, :, 0] - exact))))
+
+# Add the labels
+legend(legends, loc='best', frameon=False)  # Add the legends
+xlabel('u/U0')
+ylabel('y/L')
+show()
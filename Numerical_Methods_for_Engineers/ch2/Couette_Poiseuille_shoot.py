@@ -1,6 +1,6 @@
 # src-ch2/Couette_Poiseuille_shoot.py;ODEschemes.py @ git@lrhgit/tkt4140/src/src-ch2/ODEschemes.py;
 
-from ODEschemes import euler, heun, rk4
+from ODEschemes import euler, heun, rk4, shoot
 import numpy as np
 from matplotlib.pyplot import *
 
@@ -16,10 +16,13 @@ L = 1.0
 y = np.linspace(0, L, N+1)
 
 
-def f(z, t):
-    """RHS for Couette-Posieulle flow"""
-    zout = np.zeros_like(z)
-    zout[:] = [z[1], -dpdx]
+def f(z, t, dpdx, out=None):
+    """RHS for Couette-Posieulle flow, for the states z[m] of all the
+    pressure gradients dpdx[m] at once.
+    Writes into out if given (see ODEschemes.rhs_inplace)."""
+    zout = np.empty_like(z) if out is None else out
+    zout[:, 0] = z[:, 1]
+    zout[:, 1] = -dpdx
     return zout
 
 
@@ -38,27 +41,26 @@ z0 = np.zeros(2)
 dpdx_list = [-5.0, -2.5, -1.0, 0.0, 1.0, 2.5, 5.0]
 legends = []
 
-for dpdx in dpdx_list:
-    phi = []
-    for svalue in s:
-        z0[1] = svalue
-        z = rk4(f, z0, y)
-        phi.append(z[-1, 0] - beta)
+# Solve the boundary value problems of all pressure gradients at once: rk4 integrates
+# both guesses of all of them as one ensemble, then the corrected initial values
+z, s_star = shoot(f, z0, y, beta, s, params=dpdx_list, inplace=True)
 
-    # Compute correct initial guess
-    s_star = (s[0]*phi[1]-s[1]*phi[0])/(phi[1]-phi[0])
-    z0[1] = s_star
-
-    # Solve the initial value problem which is a solution to the boundary value problem
-    z = rk4(f, z0, y)
-
-    plot(z[:, 0], y, '-.')
+for m, dpdx in enumerate(dpdx_list):
+    plot(z[:, m, 0], y, '-.')
     legends.append('rk4: dp='+str(dpdx))
 
     # Plot the analytical solution
     plot(u_a(y, dpdx), y, ':')
     legends.append('exa: dp='+str(dpdx))
 
+# A sweep over many pressure gradients costs the same two ensemble integrations
+dpdx_sweep = np.linspace(-5.0, 5.0, 501)
+z, s_star, info = shoot(f, z0, y, beta, s, params=dpdx_sweep, inplace=True,
+                        full_output=True)
+error = np.max(np.abs(z[:, :, 0] - u_a(y[:, None], dpdx_sweep)))
+print('%d pressure gradients: %d ensemble integrations, all converged: %s, max error %.2e'
+      % (dpdx_sweep.size, info['shots'], info['converged'].all(), error))
+
 # Add the labels
 legend(legends, loc='best', frameon=False)  # Add the legends
 xlabel('u/U0')
@@ -0,0 +1,73 @@
+"""Solvers for systems of ODEs dz/dt = func(z, t) used by the course scripts.
+
+Importing the package only imports numpy and the explicit schemes euler,
+heun and rk4. The adaptive, implicit, multistep, symplectic and streaming
+solvers, event detection and dense output are imported on first use (scipy
+only when an implicit scheme is used), and nothing in the package imports
+matplotlib, so it is cheap to import in headless worker processes. The
+import time is measured by python -m odesolvers.importtime.
+The chapter modules ch1/ODEschemes.py and ch2/ODEschemes.py re-export the
+solvers for the scripts next to them.
+Every solver takes stats=SolverStats() to count the evaluations of func
+and time the run; see odesolvers.stats."""
+
+from .explicit import allocate_solution, state_shape, rhs_inplace, integrate, \
+    ExplicitStepper, EulerStepper, HeunStepper, RK4Stepper, euler, heun, rk4
+
+# public name: module which defines it, imported on first access
+_LAZY = {
+    'dopri45': 'adaptive',
+    'DopriStepper': 'adaptive',
+    'backward_euler': 'implicit',
+    'crank_nicolson': 'implicit',
+    'bdf2': 'implicit',
+    'ImplicitStepper': 'implicit',
+    'BackwardEulerStepper': 'implicit',
+    'TrapezoidalStepper': 'implicit',
+    'BDF2Stepper': 'implicit',
+    'stream': 'streaming',
+    'run_to_sink': 'streaming',
+    'NpySink': 'streaming',
+    'checkpointed': 'checkpoint',
+    'adams_bashforth': 'multistep',
+    'adams_moulton': 'multistep',
+    'AdamsBashforthStepper': 'multistep',
+    'AdamsMoultonStepper': 'multistep',
+    'symplectic_euler': 'symplectic',
+    'verlet': 'symplectic',
+    'leapfrog': 'symplectic',
+    'yoshida4': 'symplectic',
+    'SplittingStepper': 'symplectic',
+    'parareal': 'parareal',
+    'shoot': 'shooting',
+    'TridiagonalBVP': 'bvp',
+    'convergence_study': 'convergence',
+    'ConvergenceStudy': 'convergence',
+    'fit_order': 'convergence',
+    'ManufacturedSolution': 'mms',
+    'MMSRightHandSide': 'mms',
+    'EventTracker': 'events',
+    'hermite': 'events',
+    'DenseOutput': 'dense',
+    'DenseCollector': 'dense',
+    'SolverStats': 'stats',
+}
+
+__all__ = ['allocate_solution', 'state_shape', 'rhs_inplace', 'integrate',
+           'ExplicitStepper', 'EulerStepper', 'HeunStepper', 'RK4Stepper',
+           'euler', 'heun', 'rk4'] + \
+    sorted(_LAZY)
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        from importlib import import_module
+
+        value = getattr(import_module('.' + _LAZY[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
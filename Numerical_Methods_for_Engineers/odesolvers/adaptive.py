@@ -0,0 +1,229 @@
+"""The adaptive Dormand-Prince 5(4) scheme."""
+
+import time as _time
+
+import numpy as np
+
+from .explicit import allocate_solution, rhs, _output
+
+
+# Dormand-Prince 5(4) tableau; the last stage is evaluated at the new
+# solution, so it is reused as the first stage of the next step (FSAL)
+DOPRI_C = np.array([0.0, 1.0/5, 3.0/10, 4.0/5, 8.0/9, 1.0, 1.0])
+DOPRI_A = [[],
+           [1.0/5],
+           [3.0/40, 9.0/40],
+           [44.0/45, -56.0/15, 32.0/9],
+           [19372.0/6561, -25360.0/2187, 64448.0/6561, -212.0/729],
+           [9017.0/3168, -355.0/33, 46732.0/5247, 49.0/176, -5103.0/18656],
+           [35.0/384, 0.0, 500.0/1113, 125.0/192, -2187.0/6784, 11.0/84]]
+DOPRI_B = np.array([35.0/384, 0.0, 500.0/1113, 125.0/192, -2187.0/6784, 11.0/84, 0.0])
+# difference between the 5th and the embedded 4th order weights
+DOPRI_E = np.array([71.0/57600, 0.0, -71.0/16695, 71.0/1920, -17253.0/339200,
+                    22.0/525, -1.0/40])
+# 4th order continuous extension, coefficients of theta, ..., theta**4
+DOPRI_DENSE_B = np.array([
+    [1.0, -8048581381.0/2820520608, 8663915743.0/2820520608,
+     -12715105075.0/11282082432],
+    [0.0, 0.0, 0.0, 0.0],
+    [0.0, 131558114200.0/32700410799, -68118460800.0/10900136933,
+     87487479700.0/32700410799],
+    [0.0, -1754552775.0/470086768, 14199869525.0/1410260304,
+     -10690763975.0/1880347072],
+    [0.0, 127303824393.0/49829197408, -318862633887.0/49829197408,
+     701980252875.0/199316789632],
+    [0.0, -282668133.0/205662961, 2019193451.0/616988883, -1453857185.0/822651844],
+    [0.0, 40617522.0/29380423, -110615467.0/29380423, 69997945.0/29380423]])
+
+
+class DopriStepper(object):
+    """Stages of the Dormand-Prince 5(4) scheme with preallocated buffers.
+    k[0] must hold f(z, t) when attempt is called; after an accepted step
+    accept copies the last stage into k[0] (first same as last)."""
+    order = 5
+    dense = ('k',)
+
+    def __init__(self, f, shape):
+        self.f = f
+        self.k = np.zeros((7,) + shape)
+        self.tmp = np.zeros(shape)
+        self.err = np.zeros(shape)
+
+    def _stage(self, z, s, dt, out):
+        k, tmp = self.k, self.tmp
+        np.multiply(k[0], dt*DOPRI_A[s][0], out=out)
+        for j in range(1, s):
+            if DOPRI_A[s][j] != 0.0:
+                np.multiply(k[j], dt*DOPRI_A[s][j], out=tmp)
+                out += tmp
+        out += z
+        return out
+
+    def attempt(self, z, t, dt, out, rtol, atol):
+        """Try a step of size dt from (z, t), write the 5th order solution
+        into out and return the weighted RMS norm of the local error."""
+        k, tmp, err = self.k, self.tmp, self.err
+        for s in range(1, 6):
+            self._stage(z, s, dt, err)      # err is a free buffer here
+            self.f(err, t + DOPRI_C[s]*dt, k[s])
+        self._stage(z, 6, dt, out)
+        self.f(out, t + dt, k[6])
+
+        np.multiply(k[0], dt*DOPRI_E[0], out=err)
+        for j in range(2, 7):
+            np.multiply(k[j], dt*DOPRI_E[j], out=tmp)
+            err += tmp
+        np.abs(z, out=tmp)                  # error weights
+        np.maximum(tmp, np.abs(out, out=k[1]), out=tmp)
+        tmp *= rtol
+        tmp += atol
+        err /= tmp
+        e = err.ravel()
+        return np.sqrt(np.dot(e, e)/e.size)
+
+    def accept(self):
+        self.k[0] = self.k[6]
+
+
+def _initial_step(f, z, t, f0, order, rtol, atol):
+    """Starting step size after Hairer, Norsett and Wanner, Solving ODE I, II.4.
+    Costs one evaluation of f."""
+    scale = atol + rtol*np.abs(z)
+    d0 = np.sqrt(np.mean((z/scale)**2))
+    d1 = np.sqrt(np.mean((f0/scale)**2))
+    if d0 < 1e-5 or d1 < 1e-5:
+        h0 = 1e-6
+    else:
+        h0 = 0.01*d0/d1
+    f1 = f(z + h0*f0, t + h0, np.zeros_like(z))
+    d2 = np.sqrt(np.mean(((f1 - f0)/scale)**2))/h0
+    if max(d1, d2) <= 1e-15:
+        h1 = max(1e-6, h0*1e-3)
+    else:
+        h1 = (0.01/max(d1, d2))**(1.0/(order + 1))
+    return min(100*h0, h1)
+
+
+# define adaptive Dormand-Prince scheme
+def dopri45(func, z0, time, rtol=1e-6, atol=1e-9, h0=None, max_steps=100000,
+            full_output=False, inplace=False, events=None, dense_output=False,
+            stats=None):
+    """The adaptive Dormand-Prince 5(4) scheme for solution of systems of ODEs.
+    z0 is a vector (or an (n_members, n_states) ensemble) for the initial
+    conditions, the right hand side of the system is represented by func
+    which returns a vector with the same size as z0 .
+    The step size is chosen by a PI controller such that the weighted RMS norm
+    of the local error, with weights atol + rtol*|z|, stays below one, and the
+    solution is returned at the times in time, which the steps are clipped to
+    hit. The last stage of an accepted step is reused as the first stage of
+    the next one, and a rejected step does not evaluate the first stage again.
+    With inplace=True func is called as func(z, t, out); see rhs_inplace.
+    events is an event function g(z, t) or a list of them; see EventTracker.
+
+    If full_output is True a dict with the number of accepted and rejected
+    steps (naccept, nreject), the number of evaluations of func (nfev), the
+    accepted step sizes (h), the times t of the rows of z and the event
+    times and states (t_events, z_events) is returned as well.
+    With dense_output=True the dict is always returned and holds the
+    DenseOutput sol, the 4th order continuous extension of the accepted steps.
+    A SolverStats object passed as stats is filled with counts and timings;
+    its nfev also counts the evaluations for the events."""
+
+    start = _time.perf_counter()
+    safety, fac_min, fac_max = 0.9, 0.2, 10.0
+    beta = 0.04                 # PI controller parameters
+    alpha = 0.2 - 0.75*beta
+
+    z = allocate_solution(z0, time)
+    f = rhs(func, inplace, stats)
+    timed = stats is not None and stats.record_steps
+    clock = _time.perf_counter
+    stepper = DopriStepper(f, z.shape[1:])
+    t = time[0]
+    y = z[0].copy()
+    ynew = np.zeros_like(y)
+    f(y, t, stepper.k[0])
+    nfev, naccept, nreject = 1, 0, 0
+    steps = []
+
+    direction = np.sign(time[-1] - time[0])
+    if h0 is None:
+        h = _initial_step(f, y, t, stepper.k[0], 4, rtol, atol)
+        nfev += 1
+    else:
+        h = abs(h0)
+    err_old = 1e-4
+    rejected = False
+    tracker = None
+    if events is not None:
+        from .events import EventTracker
+        tracker = EventTracker(events, f, y, t)
+    dense = None
+    if dense_output:
+        from .dense import DenseCollector
+        dense = DenseCollector(stepper, DOPRI_DENSE_B)
+    t_out = time
+
+    for i in range(1, len(time)):
+        while direction*(time[i] - t) > 0:
+            if naccept + nreject >= max_steps:
+                raise RuntimeError('dopri45: max_steps = %d reached at t = %g'
+                                   % (max_steps, t))
+            remaining = abs(time[i] - t)
+            hit = remaining <= 1.01*h   # stretch the step a little to hit time[i]
+            hstep = remaining if hit else h
+            dt = direction*hstep
+            if timed:
+                start_step = clock()
+                err = stepper.attempt(y, t, dt, ynew, rtol, atol)
+                stats.step_times.append(clock() - start_step)
+            else:
+                err = stepper.attempt(y, t, dt, ynew, rtol, atol)
+            nfev += 6
+
+            if err <= 1.0:
+                fac = safety*max(err, 1e-10)**(-alpha)*err_old**beta
+                fac = min(fac_max, max(fac_min, fac))
+                if rejected:
+                    fac = min(fac, 1.0)
+                err_old = max(err, 1e-4)
+                rejected = False
+                naccept += 1
+                steps.append(hstep)
+                tnew = time[i] if hit else t + dt
+                if dense is not None:
+                    dense.record(y, t, tnew - t, ynew, stepper.k)
+                stop = tracker is not None and tracker.check(y, ynew, t, tnew,
+                                                             stepper.k[0], stepper.k[6])
+                t = tnew
+                y, ynew = ynew, y
+                stepper.accept()
+                if hstep >= h:
+                    h = hstep*fac
+                else:                   # keep the controller step if clipped
+                    h = max(h, hstep*fac)
+                if stop:
+                    break
+            else:
+                h = hstep*max(fac_min, safety*err**(-alpha))
+                rejected = True
+                nreject += 1
+        z[i] = y
+        if tracker is not None and not tracker.active.any():
+            z = z[:i+1]
+            t_out = time[:i+1].copy()
+            if not tracker.ensemble:
+                t_out[-1] = tracker.t_stop
+            break
+
+    info = {'nfev': nfev, 'naccept': naccept, 'nreject': nreject,
+            'h': np.asarray(steps)}
+    output = _output(z, t_out, tracker, full_output, info, dense)
+    if stats is not None:
+        stats.naccept += naccept
+        stats.nreject += nreject
+        stats.nfev_saved += naccept + nreject     # first same as last
+        if tracker is not None:
+            stats.nfev_saved += tracker.nfev_saved
+        stats.time_total += _time.perf_counter() - start
+    return output
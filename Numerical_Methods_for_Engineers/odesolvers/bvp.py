@@ -0,0 +1,89 @@
+"""Finite difference solution of linear two point boundary value problems
+with a tridiagonal system, which is factorized once for any number of
+right hand sides."""
+
+import numpy as np
+
+BOUNDARY_CONDITIONS = ('dirichlet', 'neumann')
+
+
+class TridiagonalBVP(object):
+    """Central differences on the uniform grid x for the linear problem
+        a(x)*u'' + b(x)*u' + c(x)*u = rhs(x)
+    with the boundary condition left at x[0] and right at x[-1]:
+    'dirichlet' fixes u and 'neumann' fixes u', which is discretized with a
+    ghost point outside the grid, so the scheme is second order at the ends
+    too. a, b and c are scalars or arrays of values on x.
+
+    The tridiagonal matrix is LU factorized (LAPACK dgttrf) when the
+    problem is made; solve only does the O(N) forward and back
+    substitutions (dgttrs), for one right hand side or many at once, so
+    new source terms and boundary values, e.g. a sweep over a parameter,
+    never factorize again."""
+
+    def __init__(self, x, a=1.0, b=0.0, c=0.0, left='dirichlet', right='dirichlet'):
+        from scipy.linalg.lapack import dgttrf, dgttrs
+
+        for bc in (left, right):
+            if bc not in BOUNDARY_CONDITIONS:
+                raise ValueError('boundary condition must be one of %s, got %r'
+                                 % (BOUNDARY_CONDITIONS, bc))
+        x = np.asarray(x, dtype=float)
+        if x.ndim != 1 or x.size < 3:
+            raise ValueError('x must be a grid of at least 3 points')
+        h = (x[-1] - x[0])/(x.size - 1)
+        if not np.allclose(np.diff(x), h, rtol=1e-9, atol=0.0):
+            raise ValueError('x must be a uniform grid')
+        n = x.size
+        a, b, c = [np.broadcast_to(np.asarray(v, dtype=float), (n,)) for v in (a, b, c)]
+        lower = a/h**2 - b/(2*h)         # coefficients of u[i-1], u[i], u[i+1]
+        diag = -2*a/h**2 + c
+        upper = a/h**2 + b/(2*h)
+
+        dl, d, du = lower[1:].copy(), diag.copy(), upper[:-1].copy()
+        if left == 'dirichlet':
+            d[0], du[0] = 1.0, 0.0
+        else:                           # ghost point u[-1] = u[1] - 2*h*u'
+            du[0] += lower[0]
+        if right == 'dirichlet':
+            d[-1], dl[-1] = 1.0, 0.0
+        else:                           # ghost point u[n] = u[n-2] + 2*h*u'
+            dl[-1] += upper[-1]
+
+        self.x, self.h = x, h
+        self.left, self.right = left, right
+        self.lower0, self.upper1 = lower[0], upper[-1]
+        self.dgttrs = dgttrs
+        self.lu = dgttrf(dl, d, du)
+        info = self.lu[-1]
+        if info > 0:
+            raise ValueError('the finite difference matrix is singular (zero pivot in '
+                             'row %d); e.g. Neumann conditions at both ends with c = 0'
+                             % info)
+        self.nsolve = 0
+
+    def solve(self, rhs=0.0, left=0.0, right=0.0):
+        """Solve for the right hand side rhs, u (or u') = left at x[0] and
+        right at x[-1]. rhs is a scalar, an array of values on x or an
+        (n_x, m) array of m right hand sides, which are solved at once; left
+        and right are then scalars or arrays of m values. Returns u with the
+        shape of rhs on the grid, (n_x,) or (n_x, m)."""
+
+        n = self.x.size
+        rhs = np.asarray(rhs, dtype=float)
+        m = rhs.shape[1] if rhs.ndim == 2 else max(np.size(left), np.size(right), 1)
+        batch = rhs.ndim == 2 or np.ndim(left) > 0 or np.ndim(right) > 0
+        B = np.empty((n, m), order='F')
+        B[...] = rhs.reshape(n, -1) if rhs.ndim else rhs
+        if self.left == 'dirichlet':
+            B[0] = left
+        else:
+            B[0] += 2*self.h*self.lower0*np.asarray(left)
+        if self.right == 'dirichlet':
+            B[-1] = right
+        else:
+            B[-1] -= 2*self.h*self.upper1*np.asarray(right)
+        dl, d, du, du2, ipiv, info = self.lu
+        u, info = self.dgttrs(dl, d, du, du2, ipiv, B, overwrite_b=True)
+        self.nsolve += m
+        return u if batch else u[:, 0]
@@ -0,0 +1,199 @@
+"""Checkpoint and restart of long runs of the fixed step schemes: the run
+is saved to an .npz file every so many steps (or seconds), and a run that
+was interrupted continues from the last checkpoint with bit for bit the
+same result as an uninterrupted run."""
+
+import hashlib
+import os
+import time as _time
+
+import numpy as np
+
+from .explicit import state_shape, rhs
+from .streaming import stepper_class, precision_options
+
+
+def _grid_key(scheme, z0, time, options):
+    """Identity of a run: the scheme, the state shape, the time grid and the
+    options of the stepper (callables, e.g. jac, by func_identity)."""
+    from .convergence import func_identity
+
+    time = np.ascontiguousarray(time, dtype=float)
+    options = sorted((name, func_identity(value, strict=False) if callable(value) else value)
+                     for name, value in options.items())
+    return '%s|%s|%s|%s' % (getattr(scheme, '__name__', scheme), state_shape(z0),
+                            hashlib.sha1(time.tobytes()).hexdigest(),
+                            hashlib.sha1(repr(options).encode()).hexdigest())
+
+
+def flatten_state(state, prefix='rng:'):
+    """The nested dict state of a numpy bit generator as arrays for an .npz
+    file (without pickles): arrays are kept, ints (which may not fit in 64
+    bits, e.g. of PCG64) and strings are stored as text, floats as arrays.
+    Raises TypeError for anything else."""
+    arrays = {}
+    for name, value in state.items():
+        key = prefix + name
+        if isinstance(value, dict):
+            arrays.update(flatten_state(value, key + '.'))
+        elif isinstance(value, np.ndarray):
+            arrays[key + '#array'] = value
+        elif isinstance(value, (bool, np.bool_)):
+            arrays[key + '#bool'] = np.array(bool(value))
+        elif isinstance(value, (int, np.integer)):
+            arrays[key + '#int'] = np.array(str(int(value)))
+        elif isinstance(value, str):
+            arrays[key + '#str'] = np.array(value)
+        elif isinstance(value, (float, np.floating)):
+            arrays[key + '#float'] = np.array(float(value))
+        else:
+            raise TypeError('can not save %s of type %s in a checkpoint'
+                            % (key, type(value).__name__))
+    return arrays
+
+
+def unflatten_state(arrays, prefix='rng:'):
+    """The nested dict saved by flatten_state."""
+    state = {}
+    for key, value in arrays.items():
+        if not key.startswith(prefix):
+            continue
+        path, kind = key[len(prefix):].rsplit('#', 1)
+        names = path.split('.')
+        node = state
+        for name in names[:-1]:
+            node = node.setdefault(name, {})
+        node[names[-1]] = {'array': lambda v: np.array(v), 'bool': lambda v: bool(v),
+                           'int': lambda v: int(str(v)), 'str': lambda v: str(v),
+                           'float': lambda v: float(v)}[kind](value)
+    return state
+
+
+def save_checkpoint(filename, arrays):
+    """Write arrays to the .npz file filename atomically, so that an
+    interrupted write leaves the previous checkpoint intact."""
+    tmp = '%s.%d.tmp' % (filename, os.getpid())
+    with open(tmp, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, filename)
+
+
+def load_checkpoint(filename):
+    """The arrays of a checkpoint file as a dict."""
+    with np.load(filename, allow_pickle=False) as data:
+        return {name: data[name] for name in data.files}
+
+
+def history_filename(filename):
+    """The .npy file next to the checkpoint filename with the solution up
+    to the last checkpoint, which is only appended to."""
+    root = filename[:-4] if filename.endswith('.npz') else filename
+    return root + '_z.npy'
+
+
+def checkpointed(scheme, func, z0, time, filename, every=1000, every_seconds=None,
+                 history=True, inplace=False, rng=None, full_output=False, stats=None,
+                 dtype=float, accumulate=False, **options):
+    """Solve dz/dt = func(z, t) with a fixed step scheme (one of the
+    schemes of stream, or its name) and save a checkpoint to the .npz file
+    filename every every steps and, if every_seconds is given, whenever that
+    many seconds have passed since the last one. If filename exists the
+    run continues from it; the result is bit for bit the same as that of an
+    uninterrupted run. Delete the file to start over; a checkpoint of a
+    different scheme, state shape, time grid or options raises ValueError.
+
+    A checkpoint holds the step index, the current state, the state of the
+    stepper (the history of the multistep schemes, the Jacobian and LU of
+    the implicit ones, ...; see ExplicitStepper.get_state) and the state
+    of the numpy Generator rng if func draws random numbers from it. With
+    history=True the solution is returned as the (n_time, ...) array the
+    schemes return, and the rows up to the last checkpoint are kept in the
+    file history_filename(filename), to which each checkpoint only appends
+    its new rows; with history=False only the final state is returned.
+    options are passed to the stepper, e.g. order=3 for adams_bashforth or
+    jac for the implicit schemes; dtype and accumulate are as for stream.
+
+    If full_output is True a dict is returned as well with the step the
+    run started from (resumed_from, 0 for a new run) and the number of
+    checkpoints written."""
+
+    from numpy.lib.format import open_memmap
+
+    time = np.asarray(time, dtype=float)
+    if every < 1:
+        raise ValueError('every must be positive')
+    if rng is not None:
+        flatten_state(rng.bit_generator.state)     # fail before any work
+    shape = state_shape(z0)
+    options = dict(options, **precision_options(scheme, dtype, accumulate))
+    stepper = stepper_class(scheme)(rhs(func, inplace, stats), shape, **options)
+    key = _grid_key(scheme, z0, time, options)
+    n = len(time)
+    z = np.zeros(((n if history else 2),) + shape, dtype=dtype)
+    z[0] = np.asarray(z0).reshape(shape)
+    z_file = history_filename(filename) if history else None
+
+    z_disk = None
+    i0 = 0
+    cur = 0                             # row of the current state if not history
+    if os.path.exists(filename):
+        data = load_checkpoint(filename)
+        if str(data['key']) != key:
+            raise ValueError('%s is a checkpoint of another run (%s), not of %s'
+                             % (filename, data['key'], key))
+        i0 = int(data['step'])
+        z[0 if history else cur] = data['z']
+        if history:
+            z[:i0+1] = np.load(z_file, mmap_mode='r')[:i0+1]
+        stepper.set_state({name[8:]: value for name, value in data.items()
+                           if name.startswith('stepper:')})
+        if rng is not None:
+            rng.bit_generator.state = unflatten_state(data)
+        if history:
+            z_disk = open_memmap(z_file, mode='r+')
+    elif history:
+        z_disk = open_memmap(z_file, mode='w+', dtype=dtype, shape=z.shape)
+        z_disk[0] = z[0]
+    counts = dict((name, getattr(stepper, name, 0))
+                  for name in ('nfev_saved', 'njev', 'nlu'))
+
+    saved = [i0]                        # step of the last checkpoint
+
+    def save(i):
+        if history:                     # the new rows first, then the checkpoint
+            z_disk[saved[0]+1:i+1] = z[saved[0]+1:i+1]
+            z_disk.flush()
+        arrays = {'key': np.array(key), 'step': np.array(i),
+                  'z': z[i] if history else z[cur]}
+        for name, value in stepper.get_state().items():
+            arrays['stepper:' + name] = value
+        if rng is not None:
+            arrays.update(flatten_state(rng.bit_generator.state))
+        save_checkpoint(filename, arrays)
+        saved[0] = i
+
+    clock = _time.perf_counter
+    start = last = clock()
+    ncheckpoints = 0
+    for i in range(i0, n - 1):
+        if history:
+            stepper.step(z[i], time[i], time[i+1] - time[i], z[i+1])
+        else:
+            stepper.step(z[cur], time[i], time[i+1] - time[i], z[1-cur])
+            cur = 1 - cur
+        if (i + 1) % every == 0 or i + 1 == n - 1 or \
+                (every_seconds is not None and clock() - last >= every_seconds):
+            save(i + 1)
+            ncheckpoints += 1
+            last = clock()
+    del z_disk
+    if stats is not None:
+        stats.naccept += n - 1 - i0
+        for name, count in counts.items():
+            setattr(stats, name, getattr(stats, name) + getattr(stepper, name, 0) - count)
+        stats.time_total += clock() - start
+
+    result = z if history else z[cur].copy()
+    if not full_output:
+        return result
+    return result, {'resumed_from': i0, 'checkpoints': ncheckpoints}
@@ -0,0 +1,291 @@
+"""Convergence studies: the observed order of accuracy of the schemes, with
+the runs on a process pool and each solution cached on disk."""
+
+import hashlib
+import inspect
+import os
+
+import numpy as np
+
+from .explicit import euler, heun, rk4
+
+
+def cache_dir():
+    """Directory of the cached solutions: $ODESOLVERS_CACHE, by default
+    ~/.cache/odesolvers."""
+    return os.environ.get('ODESOLVERS_CACHE',
+                          os.path.join(os.path.expanduser('~'), '.cache', 'odesolvers'))
+
+
+def _value_digest(value, seen):
+    """Hash of a value func depends on: numbers, strings, arrays, tuples,
+    lists and dicts of them, and functions (by func_identity). Raises
+    TypeError for anything else."""
+    if value is None or isinstance(value, (bool, int, float, complex, str, bytes)):
+        return repr(value)
+    if isinstance(value, np.generic):
+        value = np.asarray(value)
+    if isinstance(value, np.ndarray) and value.dtype != object:
+        value = np.ascontiguousarray(value)
+        return 'array(%s, %s, %s)' % (value.dtype.str, value.shape,
+                                      hashlib.sha1(value.tobytes()).hexdigest())
+    if isinstance(value, (tuple, list)):
+        return '%s(%s)' % (type(value).__name__,
+                           ', '.join(_value_digest(v, seen) for v in value))
+    if isinstance(value, dict):
+        return 'dict(%s)' % ', '.join('%s: %s' % (_value_digest(k, seen), _value_digest(v, seen))
+                                      for k, v in sorted(value.items(), key=lambda kv: repr(kv[0])))
+    if callable(value):
+        return _identity(value, seen, strict=True)
+    raise TypeError('can not hash a value of type %s' % type(value).__name__)
+
+
+def _identity(func, seen, strict):
+    if isinstance(getattr(func, 'identity', None), str):
+        return '%s:%s' % (type(func).__name__, func.identity)
+    if id(func) in seen:                        # recursive functions
+        return 'recursion'
+    seen = seen | {id(func)}
+    try:
+        code = inspect.getsource(func).encode()
+    except (OSError, TypeError):
+        code = getattr(getattr(func, '__code__', None), 'co_code', repr(func).encode())
+    name = getattr(func, '__qualname__', getattr(func, '__name__', repr(func)))
+    values = []
+    cells = getattr(func, '__closure__', None) or ()
+    names = getattr(getattr(func, '__code__', None), 'co_freevars', ())
+    for label, value in ([('defaults', getattr(func, '__defaults__', None)),
+                          ('kwdefaults', getattr(func, '__kwdefaults__', None))] +
+                         [(n, c.cell_contents) for n, c in zip(names, cells)]):
+        try:
+            values.append('%s=%s' % (label, _value_digest(value, seen)))
+        except (TypeError, ValueError):         # also empty cells
+            if strict:
+                raise ValueError('the value of %s of %s can not be hashed; pass key= '
+                                 '(or cache=False) to identify the run' % (label, name))
+    # module level data read by func (functions, modules and classes are not)
+    global_names = getattr(getattr(func, '__code__', None), 'co_names', ())
+    namespace = getattr(func, '__globals__', {})
+    for n in sorted(set(global_names)):
+        if n in namespace and not callable(namespace[n]) and \
+                not inspect.ismodule(namespace[n]):
+            try:
+                values.append('%s=%s' % (n, _value_digest(namespace[n], seen)))
+            except TypeError:
+                pass
+    digest = hashlib.sha1(code + '|'.join(values).encode()).hexdigest()
+    return '%s.%s:%s' % (getattr(func, '__module__', ''), name, digest)
+
+
+def func_identity(func, strict=True):
+    """String which identifies the right hand side func: its module, name
+    and a hash of its source code (of its byte code if there is no source),
+    of its default arguments, of the values in its closure (the variables of
+    an enclosing function, e.g. a parameter of a lambda made in a loop) and
+    of the module level numbers, strings and arrays it reads. Functions
+    among these values are identified in the same way. If a default or
+    closure value can not be hashed ValueError is raised, unless strict is
+    False; it is then left out, and the caller must identify it otherwise.
+    Callable objects with an identity attribute (e.g. MMSRightHandSide) are
+    identified by it."""
+    return _identity(func, frozenset(), strict)
+
+
+_SCHEME_SOURCES = {}
+
+
+def scheme_identity(scheme):
+    """Name of scheme and a hash of the source of the module which defines
+    it and of the explicit module with the shared driver, so that cached
+    solutions are recomputed when a scheme is changed."""
+    from . import explicit
+
+    name = '%s.%s' % (scheme.__module__, scheme.__name__)
+    if name not in _SCHEME_SOURCES:
+        modules = [inspect.getmodule(scheme), explicit]
+        try:
+            source = ''.join(inspect.getsource(m) for m in modules if m is not None)
+        except (OSError, TypeError):
+            source = repr(getattr(getattr(scheme, '__code__', None), 'co_code', scheme))
+        _SCHEME_SOURCES[name] = '%s:%s' % (name, hashlib.sha1(source.encode()).hexdigest())
+    return _SCHEME_SOURCES[name]
+
+
+def run_key(scheme, func, z0, t0, tend, N, key=None):
+    """Cache key of the solution of func by scheme with N steps from t0 to
+    tend. Without key every value func depends on must be hashable (see
+    func_identity)."""
+    z0 = np.ascontiguousarray(z0, dtype=float)
+    parts = [scheme_identity(scheme), func_identity(func, strict=key is None),
+             repr(z0.shape), z0.tobytes().hex(), repr(float(t0)), repr(float(tend)),
+             repr(int(N)), repr(key)]
+    return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+
+def _solve_level(task):
+    """Worker: solve with one scheme and N, or load the solution from the cache."""
+    scheme, func, z0, t0, tend, N, inplace, filename = task
+    if filename is not None and os.path.exists(filename):
+        return np.load(filename), True
+    z = scheme(func, z0, np.linspace(t0, tend, N + 1), inplace=inplace)
+    if filename is not None:
+        tmp = '%s.%d.tmp.npy' % (filename[:-4], os.getpid())
+        np.save(tmp, z)
+        os.replace(tmp, filename)   # atomic, for concurrent studies
+    return z, False
+
+
+def fit_order(h, errors, points=None, tol=0.1, full_output=False):
+    """Fit errors = C*h**p for the step sizes h in closed form, by linear
+    least squares on log(errors) = log(C) + p*log(h). errors is an array of
+    errors for each h, or a 2D array with one row per scheme, which are all
+    fitted at once. points=k uses only the k smallest step sizes (the last k
+    levels); with points=2 the fit goes through both points, which is the
+    solution of C*h1**p = error1, C*h2**p = error2.
+
+    Returns C and p, and if full_output is True also a dict with
+        p_stderr      standard error of p (nan for two points)
+        r2            coefficient of determination of the log-log fit
+        local_orders  observed orders between successive levels (all levels)
+        asymptotic    True if the last two local orders differ by less than
+                      tol, i.e. the errors are in the asymptotic range
+        points        the number of levels used in the fit"""
+
+    h = np.asarray(h, dtype=float)
+    errors = np.asarray(errors, dtype=float)
+    X = np.log(h)
+    Y = np.log(errors)
+    if points is not None:
+        X, Y = X[-points:], Y[..., -points:]
+    n = X.size
+    if n < 2:
+        raise ValueError('fit_order needs at least two levels')
+    dX = X - X.mean()
+    dY = Y - Y.mean(axis=-1, keepdims=True)
+    Sxx = np.dot(dX, dX)
+    p = np.dot(dY, dX)/Sxx
+    C = np.exp(Y.mean(axis=-1) - p*X.mean())
+    if not full_output:
+        return C, p
+
+    residual = dY - p[..., None]*dX if np.ndim(p) else dY - p*dX
+    SSres = np.sum(residual**2, axis=-1)
+    SStot = np.sum(dY**2, axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p_stderr = np.sqrt(SSres/(n - 2)/Sxx) if n > 2 else np.full(np.shape(p), np.nan)
+        r2 = np.where(SStot > 0, 1.0 - SSres/np.where(SStot > 0, SStot, 1.0), 1.0)[()]
+    logh = np.log(h)
+    loge = np.log(errors)
+    local = np.diff(loge, axis=-1)/np.diff(logh)
+    if local.shape[-1] >= 2:
+        asymptotic = np.abs(local[..., -1] - local[..., -2]) < tol
+    else:
+        asymptotic = np.zeros(np.shape(p), dtype=bool)
+    info = {'p_stderr': p_stderr, 'r2': r2, 'local_orders': local,
+            'asymptotic': asymptotic, 'points': n}
+    return C, p, info
+
+
+class ConvergenceStudy(object):
+    """Result of convergence_study. For the schemes (names in schemes) and
+    the numbers of time steps N (step sizes h) it holds
+        errors[i, j]  the error of scheme i with N[j] steps
+        orders[i, j]  the observed order log(errors[i, j-1]/errors[i, j])/
+                      log(h[j-1]/h[j]), nan for j = 0
+        z[name, N]    the solutions
+    and the number of solutions taken from the cache (cached) and computed
+    (computed)."""
+
+    def __init__(self, schemes, N, h, errors, z, cached, computed):
+        self.schemes = schemes
+        self.N = N
+        self.h = h
+        self.errors = errors
+        self.orders = np.full(errors.shape, np.nan)
+        self.orders[:, 1:] = np.log(errors[:, :-1]/errors[:, 1:])/np.log(h[:-1]/h[1:])
+        self.z = z
+        self.cached = cached
+        self.computed = computed
+
+    def fit(self, points=None, tol=0.1):
+        """C, p and the diagnostics of fit_order for all schemes at once."""
+        return fit_order(self.h, self.errors, points, tol, full_output=True)
+
+    def table(self):
+        """The study as a structured array with the fields scheme, N, h,
+        error and order, one row per run."""
+        dtype = [('scheme', 'U32'), ('N', int), ('h', float), ('error', float),
+                 ('order', float)]
+        rows = [(name, self.N[j], self.h[j], self.errors[i, j], self.orders[i, j])
+                for i, name in enumerate(self.schemes) for j in range(len(self.N))]
+        return np.array(rows, dtype=dtype)
+
+    def __str__(self):
+        lines = ['%-16s %8s %12s %12s %8s' % ('scheme', 'N', 'h', 'error', 'order')]
+        for row in self.table():
+            lines.append('%-16s %8d %12.4e %12.4e %8.3f' % tuple(row))
+        return '\n'.join(lines)
+
+
+def convergence_study(func, z0, t0, tend, exact, schemes=(euler, heun, rk4), N0=10,
+                      levels=5, component=0, inplace=False, key=None, workers=None,
+                      cache=True):
+    """Run every scheme in schemes with N0, 2*N0, ..., 2**levels*N0 time
+    steps from t0 to tend and compute the errors and observed orders.
+    exact(time) is the exact solution on the time grid: the values of the
+    component component of z, or of the whole state if component is None.
+    The error is the largest absolute error over the time grid.
+
+    The runs are distributed over a pool of workers processes (default: the
+    number of cores; workers=1 runs them in this process). func and the
+    schemes must then be picklable, i.e. defined at module level, and the
+    calling script needs an if __name__ == '__main__': guard.
+    With cache=True every solution is stored in cache_dir() under a key made
+    of the scheme, the identity of func (see func_identity), z0, t0, tend,
+    N and key, so a repeated study, or one with a finer level added, only
+    computes the new runs. Pass as key anything else func depends on, e.g.
+    the manufactured solution of an MMS study; key is required if func
+    closes over values which can not be hashed. Returns a ConvergenceStudy."""
+
+    N = N0*2**np.arange(levels + 1)
+    h = (tend - t0)/N
+    directory = None
+    if cache:
+        directory = os.path.join(cache_dir(), 'convergence')
+        os.makedirs(directory, exist_ok=True)
+    tasks = []
+    for scheme in schemes:
+        for n in N:
+            filename = None
+            if directory is not None:
+                filename = os.path.join(directory, run_key(scheme, func, z0, t0, tend,
+                                                           n, key) + '.npy')
+            tasks.append((scheme, func, z0, t0, tend, int(n), inplace, filename))
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    todo = [k for k, task in enumerate(tasks)
+            if task[-1] is None or not os.path.exists(task[-1])]
+    results = [None]*len(tasks)
+    if workers > 1 and len(todo) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        # largest runs first, so that they do not end up last on one worker
+        todo.sort(key=lambda k: -tasks[k][5])
+        with ProcessPoolExecutor(max_workers=min(workers, len(todo))) as pool:
+            for k, result in zip(todo, pool.map(_solve_level, [tasks[k] for k in todo])):
+                results[k] = result
+    for k, task in enumerate(tasks):
+        if results[k] is None:
+            results[k] = _solve_level(task)
+
+    errors = np.zeros((len(schemes), len(N)))
+    z = {}
+    names = [scheme.__name__ for scheme in schemes]
+    for k, (zk, from_cache) in enumerate(results):
+        i, j = divmod(k, len(N))
+        time = np.linspace(t0, tend, N[j] + 1)
+        values = zk if component is None else zk[:, component]
+        errors[i, j] = np.max(np.abs(values - np.asarray(exact(time))))
+        z[names[i], int(N[j])] = zk
+    cached = sum(1 for zk, from_cache in results if from_cache)
+    return ConvergenceStudy(names, N, h, errors, z, cached, len(results) - cached)
@@ -0,0 +1,98 @@
+"""Continuous (dense) output of the solutions computed by the schemes."""
+
+import numpy as np
+
+
+# cubic Hermite interpolation written in the same form, for the stages
+# [f(z_n), f(z_n+1), (z_n+1 - z_n)/h]
+HERMITE_B = np.array([[1.0, -2.0, 1.0],
+                      [0.0, -1.0, 1.0],
+                      [0.0, 3.0, -2.0]])
+
+
+class DenseOutput(object):
+    """Continuous solution from a run of one of the schemes. On step n from
+    t[n] to t[n+1] = t[n] + h[n] the solution is
+        z(t[n] + theta*h[n]) = z[n] + h[n]*sum_i b_i(theta)*K[n, i]
+    where the polynomials b_i(theta) = sum_j B[i, j]*theta**(j+1) depend on
+    the scheme. Calling the object with an array of times evaluates all of
+    them at once and returns an array of shape times.shape + state shape."""
+
+    def __init__(self, t, z, K, B):
+        self.t = np.asarray(t, dtype=float)
+        self.h = np.diff(self.t)
+        self.z = z
+        self.K = K
+        self.B = np.asarray(B, dtype=float)
+        self.sign = 1.0 if self.t[-1] >= self.t[0] else -1.0
+
+    def __call__(self, t):
+        t = np.asarray(t, dtype=float)
+        tq = t.ravel()
+        idx = np.searchsorted(self.sign*self.t, self.sign*tq, side='right') - 1
+        idx = np.clip(idx, 0, len(self.h) - 1)
+        theta = (tq - self.t[idx])/self.h[idx]
+        powers = theta[:, None]**np.arange(1, self.B.shape[1] + 1)
+        b = np.dot(powers, self.B.T)*self.h[idx, None]     # (n_query, n_stages)
+        zq = self.z[idx] + np.einsum('qs,qs...->q...', b, self.K[idx])
+        return zq.reshape(t.shape + zq.shape[1:])
+
+
+class DenseCollector(object):
+    """Keep what DenseOutput needs from the steps of a run. Steppers with
+    dense = None are interpolated with cubic Hermite polynomials from the
+    values of f at the time steps; otherwise dense names the stage buffers
+    of the stepper and B holds the coefficients of their weights.
+    The values of f are taken from the stage k1 of the stepper or from
+    f_end of the previous step when the stepper has them; the evaluations
+    of f otherwise are counted in nfev."""
+
+    def __init__(self, stepper, B=None):
+        self.stepper = stepper
+        self.B = B
+        self.t = []
+        self.z = []
+        self.K = []
+        self.z_end = None
+        self.f_end = None
+        self.nfev = 0
+        self.nfev_saved = 0
+
+    def record(self, z, t, dt, z_end, stages=None):
+        """Store the step of size dt from (z, t) which ended in z_end.
+        stages defaults to the stage buffers named by stepper.dense."""
+        self.t.append(t)
+        self.z.append(np.array(z))
+        if stages is not None:
+            self.K.append(np.array(stages))
+        elif self.stepper.dense is not None:
+            self.K.append(np.array([getattr(self.stepper, k) for k in self.stepper.dense]))
+        elif hasattr(self.stepper, 'k1'):
+            self.K.append(np.array(self.stepper.k1))
+        elif self.f_end is not None and self.t_end == t:
+            self.K.append(self.f_end)
+            self.nfev_saved += 1
+        else:
+            self.K.append(self.stepper.f(z, t, np.zeros_like(z)))
+            self.nfev += 1
+        self.t_end = t + dt
+        self.z_end = np.array(z_end)
+        if hasattr(self.stepper, 'f_end'):
+            self.f_end = np.array(self.stepper.f_end)
+
+    def result(self):
+        t = np.array(self.t + [self.t_end])
+        z = np.array(self.z)
+        if self.B is not None:
+            return DenseOutput(t, z, np.array(self.K), self.B)
+        if self.f_end is not None:
+            f_end = self.f_end
+            self.nfev_saved += 1
+        else:
+            f_end = self.stepper.f(self.z_end, self.t_end, np.zeros_like(self.z_end))
+            self.nfev += 1
+        f = np.array(self.K + [f_end])
+        z_next = np.concatenate([z[1:], self.z_end[None]])
+        h = np.diff(t).reshape((-1,) + (1,)*(z.ndim - 1))
+        K = np.stack([f[:-1], f[1:], (z_next - z)/h], axis=1)
+        return DenseOutput(t, z, K, HERMITE_B)
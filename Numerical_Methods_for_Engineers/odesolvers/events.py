@@ -0,0 +1,168 @@
+"""Event detection (zero crossings of g(z, t)) during integration."""
+
+import numpy as np
+
+
+def hermite(z0, f0, z1, f1, dt, theta):
+    """Cubic Hermite interpolant between (z0, f0) at t and (z1, f1) at t + dt,
+    evaluated at t + theta*dt. For an ensemble theta may hold one value per
+    member."""
+
+    theta = np.asarray(theta, dtype=float)
+    if theta.ndim > 0 and np.ndim(z0) > 1:
+        theta = theta.reshape(theta.shape + (1,)*(np.ndim(z0) - 1))
+    h01 = theta**2*(3.0 - 2.0*theta)
+    h10 = theta*(1.0 - theta)**2
+    h11 = theta**2*(theta - 1.0)
+    return z0 + h01*(z1 - z0) + dt*(h10*f0 + h11*f1)
+
+
+class EventTracker(object):
+    """Detect zero crossings of event functions g(z, t) during integration.
+    As in scipy.integrate.solve_ivp an event function may have the attributes
+    terminal (stop at the first occurrence, default False) and direction
+    (+1: only crossings from negative to positive, -1: only from positive to
+    negative, 0: both; default 0). The time of a crossing is found by
+    regula falsi (Illinois) on the cubic Hermite interpolant of the step,
+    which costs two extra evaluations of f on steps with a crossing only,
+    and fewer when the stepper passes the values of f it knows to check.
+
+    For an ensemble g returns one value per member, each member stops at its
+    own terminal event and is frozen at its event state, and the integration
+    stops when every member has stopped. The time passed to g when locating
+    a crossing is then an array with one time per member."""
+
+    def __init__(self, events, f, z0, t0):
+        if callable(events):
+            events = [events]
+        self.events = list(events)
+        self.f = f
+        self.ensemble = np.ndim(z0) > 1
+        m = z0.shape[0] if self.ensemble else 1
+        self.terminal = [bool(getattr(e, 'terminal', False)) for e in self.events]
+        self.direction = [getattr(e, 'direction', 0) for e in self.events]
+        self.g = [self._value(e, z0, t0) for e in self.events]
+        self.t_events = [[] for e in self.events]
+        self.z_events = [[] for e in self.events]
+        self.member_events = [[] for e in self.events]
+        self.active = np.ones(m, dtype=bool)
+        self.frozen = np.array(z0, dtype=float)
+        self.f0 = np.zeros_like(self.frozen)
+        self.f1 = np.zeros_like(self.frozen)
+        self.t_f1 = None            # f1 = f(z1, t_f1) for the unchanged z1
+        self.nfev = 0
+        self.nfev_saved = 0
+
+    def _value(self, event, z, t):
+        g = np.atleast_1d(np.asarray(event(z, t), dtype=float))
+        return g if self.ensemble else g[:1]
+
+    def _crossing(self, k, g0, g1):
+        up = (g0 < 0.0) & (g1 >= 0.0)
+        down = (g0 > 0.0) & (g1 <= 0.0)
+        if self.direction[k] > 0:
+            return up & self.active
+        if self.direction[k] < 0:
+            return down & self.active
+        return (up | down) & self.active
+
+    def _interpolate(self, z0, z1, t0, dt, theta):
+        if self.ensemble:
+            return hermite(z0, self.f0, z1, self.f1, dt, theta), t0 + theta*dt
+        return (hermite(z0, self.f0, z1, self.f1, dt, theta[0]),
+                t0 + theta[0]*dt)
+
+    def _locate(self, k, z0, z1, t0, dt, crossing, g0, g1, tol=1e-12, maxiter=60):
+        """theta in [0, 1] of the crossing of event k for the members in crossing."""
+        a, b = np.zeros(g0.shape), np.ones(g0.shape)
+        ga, gb = np.where(crossing, g0, -1.0), np.where(crossing, g1, 1.0)
+        side = np.zeros(g0.shape)
+        theta = b.copy()
+        for it in range(maxiter):
+            theta = np.where(gb != ga, (a*gb - b*ga)/np.where(gb != ga, gb - ga, 1.0),
+                             0.5*(a + b))
+            theta = np.clip(theta, a, b)
+            gt = self._value(self.events[k], *self._interpolate(z0, z1, t0, dt, theta))
+            left = np.sign(gt) == np.sign(ga)       # root in [theta, b]
+            gb = np.where(left & (side < 0), gb/2.0, gb)
+            ga = np.where(~left & (side > 0), ga/2.0, ga)
+            a, ga = np.where(left, theta, a), np.where(left, gt, ga)
+            b, gb = np.where(left, b, theta), np.where(left, gb, gt)
+            side = np.where(left, -1.0, 1.0)
+            if np.all(((b - a) <= tol) | (gt == 0.0) | ~crossing):
+                break
+        return theta
+
+    def check(self, z0, z1, t0, t1, f0=None, f1=None):
+        """Look for events in the step from (z0, t0) to (z1, t1). Members
+        with a terminal event are set to their event state in z1. Returns
+        True when the integration should stop.
+        f0 = f(z0, t0) and f1 = f(z1, t1) may be passed if the stepper
+        knows them; f(z0, t0) is also reused from the previous step if it
+        was evaluated there. If f1 was evaluated here and z1 is unchanged
+        afterwards, t_f1 is t1, and the stepper may reuse f1 in turn."""
+        g1 = [self._value(e, z1, t1) for e in self.events]
+        crossings = [self._crossing(k, self.g[k], g1[k]) for k in range(len(self.events))]
+        t_f1, self.t_f1 = self.t_f1, None
+        if any(c.any() for c in crossings):
+            dt = t1 - t0
+            if f0 is not None:
+                self.f0[...] = f0
+                self.nfev_saved += 1
+            elif t_f1 is not None and t_f1 == t0:
+                self.f0, self.f1 = self.f1, self.f0
+                self.nfev_saved += 1
+            else:
+                self.f(z0, t0, self.f0)
+                self.nfev += 1
+            if f1 is not None:
+                self.f1[...] = f1
+                self.nfev_saved += 1
+            else:
+                self.f(z1, t1, self.f1)
+                self.nfev += 1
+            self.t_f1 = t1
+            thetas = [self._locate(k, z0, z1, t0, dt, c, self.g[k], g1[k])
+                      if c.any() else None for k, c in enumerate(crossings)]
+            stop = np.full(self.active.shape, np.inf)   # first terminal theta
+            for k, c in enumerate(crossings):
+                if c.any() and self.terminal[k]:
+                    stop = np.where(c, np.minimum(stop, thetas[k]), stop)
+            for k, c in enumerate(crossings):
+                if not c.any():
+                    continue
+                c = c & (thetas[k] <= stop)
+                ze, te = self._interpolate(z0, z1, t0, dt, thetas[k])
+                for m in np.flatnonzero(c):
+                    self.t_events[k].append(te[m] if self.ensemble else te)
+                    self.z_events[k].append(ze[m] if self.ensemble else ze)
+                    self.member_events[k].append(m)
+            done = np.isfinite(stop)
+            if done.any():
+                ze, te = self._interpolate(z0, z1, t0, dt, np.where(done, stop, 1.0))
+                if self.ensemble:
+                    self.frozen[done] = ze[done]
+                else:
+                    self.frozen[...] = ze
+                    self.t_stop = te
+                self.active &= ~done
+        if not self.active.all():
+            self.t_f1 = None
+        if self.ensemble:
+            z1[~self.active] = self.frozen[~self.active]
+        elif not self.active[0]:
+            z1[...] = self.frozen
+        self.g = g1
+        return not self.active.any()
+
+    def results(self):
+        """Dict with the lists of event times t_events and states z_events,
+        one array per event function, and for an ensemble the member index
+        of each occurrence in member_events."""
+        shape = self.frozen.shape[1:] if self.ensemble else self.frozen.shape
+        info = {'t_events': [np.asarray(t, dtype=float) for t in self.t_events],
+                'z_events': [np.asarray(z, dtype=float).reshape((-1,) + shape)
+                             for z in self.z_events]}
+        if self.ensemble:
+            info['member_events'] = [np.asarray(m, dtype=int) for m in self.member_events]
+        return info
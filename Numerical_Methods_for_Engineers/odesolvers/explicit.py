@@ -0,0 +1,418 @@
+"""Explicit one-step schemes euler, heun and rk4 and the machinery they
+share with the other solvers: state allocation, the in-place right hand
+side protocol and the time stepping loop."""
+
+import time as _time
+
+import numpy as np
+
+
+def allocate_solution(z0, time, dtype=float):
+    """Allocate the solution array for the schemes below and insert z0.
+    A scalar or 1D z0 gives an (n_time, n_states) array as before.
+    An (n_members, n_states) z0 is an ensemble of initial conditions and
+    gives an (n_time, n_members, n_states) array; func is then called once
+    per stage with the (n_members, n_states) state of the whole ensemble
+    and must return an array of the same shape. dtype is the floating
+    point type of the solution, e.g. np.float32 for large ensembles."""
+
+    z = np.zeros((np.size(time),) + state_shape(z0), dtype=dtype)
+    z[0] = z0
+    return z
+
+
+def state_shape(z0):
+    """Shape of the state advanced by the schemes: (n_states,) for a scalar
+    or 1D z0 and z0.shape for an ensemble."""
+
+    z0 = np.asarray(z0)
+    if z0.ndim > 1:
+        return z0.shape
+    return (np.size(z0),)
+
+
+def rhs_inplace(func, inplace=False):
+    """Return the right hand side as a function f(z, t, out) which writes
+    dz/dt into the preallocated array out and returns it.
+    With inplace=True func already follows this protocol and is returned
+    as it is; func must then fill every element of out and must not modify z.
+    Otherwise func(z, t) returns a vector (or a list), which is copied into out."""
+
+    if inplace:
+        return func
+
+    def f(z, t, out):
+        out[...] = np.asarray(func(z, t))
+        return out
+
+    return f
+
+
+def stepper_state(stepper):
+    """What stepper carries from one step to the next, its attributes
+    state_attrs, as a dict of arrays (copies) for a checkpoint. Attributes
+    which are None are left out; tuples (e.g. an LU factorization) are
+    stored element by element as name.0, name.1, ..."""
+    state = {}
+    for name in stepper.state_attrs:
+        value = getattr(stepper, name)
+        if isinstance(value, tuple):
+            for j, item in enumerate(value):
+                state['%s.%d' % (name, j)] = np.array(item)
+        elif value is not None:
+            state[name] = np.array(value)
+    return state
+
+
+def set_stepper_state(stepper, state):
+    """Restore the attributes state_attrs of stepper from stepper_state.
+    Arrays are copied into the existing buffers, which may be shared."""
+    for name in stepper.state_attrs:
+        items = sorted((k for k in state if k.startswith(name + '.')),
+                       key=lambda k: int(k.rsplit('.', 1)[1]))
+        if items:
+            setattr(stepper, name, tuple(np.array(state[k]) for k in items))
+        elif name not in state:
+            setattr(stepper, name, None)
+        else:
+            value = np.asarray(state[name])
+            current = getattr(stepper, name)
+            if isinstance(current, np.ndarray) and current.shape == value.shape \
+                    and value.ndim > 0:
+                current[...] = value
+            elif value.ndim == 0:
+                setattr(stepper, name, value.item())
+            else:
+                setattr(stepper, name, value.copy())
+
+
+class ExplicitStepper(object):
+    """Base class of the explicit steppers. The first stage k1 = f(z, t) of
+    a step is not evaluated again when the caller already knows it, e.g.
+    the event detection evaluated f at the end of the previous step; the
+    saved calls are counted in nfev_saved. get_state and set_state save
+    and restore what a stepper carries from one step to the next, its
+    attributes state_attrs; see checkpoint.
+    The stage buffers have the floating point type dtype of the states. With
+    accumulate=True the update z + dt*(weighted stages) of a step is added
+    in float64 to a float64 copy of the state, which is kept from step to
+    step, so the stages are evaluated in dtype (e.g. float32) while the
+    round-off of the solution does not accumulate in dtype. Entries of the
+    state which the driver changed between steps (e.g. members frozen at a
+    terminal event) are reloaded into the float64 copy."""
+    order = None
+    dense = None                # Hermite interpolation; see DenseCollector
+    state_attrs = ('f_known', 't_known', 'nfev_saved', 'z_acc', 't_acc', 'z_last')
+
+    def __init__(self, f, shape, dtype=float, accumulate=False):
+        self.f = f
+        self.dtype = dtype
+        self.scalar = np.dtype(dtype).type  # of the factors dt*..., which would promote
+        self.k1 = np.zeros(shape, dtype=dtype)
+        self.f_known = np.zeros(shape, dtype=dtype)
+        self.t_known = None
+        self.nfev_saved = 0
+        self.z_acc = self.z_acc_new = self.z_last = None
+        self.t_acc = None
+        if accumulate:
+            self.z_acc = np.zeros(shape)
+            self.z_acc_new = np.zeros(shape)
+            self.z_last = np.zeros(shape, dtype=dtype)    # the state last written
+
+    def get_state(self):
+        return stepper_state(self)
+
+    def set_state(self, state):
+        set_stepper_state(self, state)
+
+    def known(self, t, fz):
+        """Tell the stepper that fz = f(z, t) for the state z the next step
+        starts from."""
+        if fz is not self.f_known:
+            self.f_known[...] = fz
+        self.t_known = t
+
+    def first_stage(self, z, t):
+        if self.t_known is not None and self.t_known == t:
+            self.k1[...] = self.f_known
+            self.nfev_saved += 1
+        else:
+            self.f(z, t, self.k1)
+        self.t_known = None
+        return self.k1
+
+    def update(self, z, t, dt, dz, out):
+        """out = z + dz, the end of the step from t to t + dt, in float64 from
+        the float64 state of the previous step if accumulate is True."""
+        if self.z_acc is None:
+            return np.add(z, dz, out=out)
+        if self.t_acc is not None and abs(t - self.t_acc) <= 1e-8*abs(dt):
+            changed = z != self.z_last
+            if changed.any():
+                self.z_acc[changed] = z[changed]
+            np.add(self.z_acc, dz, out=self.z_acc_new)
+        else:
+            np.add(z, dz, out=self.z_acc_new)
+        self.z_acc, self.z_acc_new = self.z_acc_new, self.z_acc
+        self.t_acc = t + dt
+        out[...] = self.z_acc
+        self.z_last[...] = out
+        return out
+
+
+class EulerStepper(ExplicitStepper):
+    """One step of the Euler scheme with a preallocated stage buffer."""
+    order = 1
+
+    def __init__(self, f, shape, dtype=float, accumulate=False):
+        ExplicitStepper.__init__(self, f, shape, dtype, accumulate)
+        self.dz = np.zeros(shape, dtype=dtype)
+
+    def step(self, z, t, dt, out):
+        """Advance z from t to t + dt and write the new state into out."""
+        k1 = self.first_stage(z, t)
+        np.multiply(k1, self.scalar(dt), out=self.dz)
+        return self.update(z, t, dt, self.dz, out)
+
+
+class HeunStepper(ExplicitStepper):
+    """One step of the Heun scheme with preallocated stage buffers.
+    The corrector reuses f(z, t) of the predictor, so a step costs two
+    evaluations of f."""
+    order = 2
+
+    def __init__(self, f, shape, dtype=float, accumulate=False):
+        ExplicitStepper.__init__(self, f, shape, dtype, accumulate)
+        self.k2 = np.zeros(shape, dtype=dtype)
+        self.zp = np.zeros(shape, dtype=dtype)
+
+    def step(self, z, t, dt, out):
+        """Advance z from t to t + dt and write the new state into out."""
+        f, k1, k2, zp = self.f, self.k1, self.k2, self.zp
+        h = self.scalar(dt)
+        self.first_stage(z, t)
+        np.multiply(k1, h, out=zp)      # Predictor step
+        zp += z
+        f(zp, t + dt, k2)
+        np.add(k1, k2, out=zp)          # Corrector step
+        zp *= h
+        zp /= 2.0
+        return self.update(z, t, dt, zp, out)
+
+
+class RK4Stepper(ExplicitStepper):
+    """One step of the Runge-Kutta 4 scheme with preallocated stage buffers."""
+    order = 4
+    dense = ('k1', 'k2', 'k3', 'k4')
+
+    def __init__(self, f, shape, dtype=float, accumulate=False):
+        ExplicitStepper.__init__(self, f, shape, dtype, accumulate)
+        self.k2 = np.zeros(shape, dtype=dtype)
+        self.k3 = np.zeros(shape, dtype=dtype)
+        self.k4 = np.zeros(shape, dtype=dtype)
+        self.zs = np.zeros(shape, dtype=dtype)
+        self.tmp = np.zeros(shape, dtype=dtype)
+
+    def step(self, z, t, dt, out):
+        """Advance z from t to t + dt and write the new state into out."""
+        f, k1, k2, k3, k4, zs = self.f, self.k1, self.k2, self.k3, self.k4, self.zs
+        dt2 = dt/2.0
+        h, h2 = self.scalar(dt), self.scalar(dt2)
+        self.first_stage(z, t)          # predictor step 1
+        np.multiply(k1, h2, out=zs)
+        zs += z
+        f(zs, t + dt2, k2)              # predictor step 2
+        np.multiply(k2, h2, out=zs)
+        zs += z
+        f(zs, t + dt2, k3)              # predictor step 3
+        np.multiply(k3, h, out=zs)
+        zs += z
+        f(zs, t + dt, k4)               # predictor step 4
+        np.multiply(k2, 2.0, out=zs)    # Corrector step
+        zs += k1
+        np.multiply(k3, 2.0, out=self.tmp)
+        zs += self.tmp
+        zs += k4
+        zs *= self.scalar(dt/6.0)
+        return self.update(z, t, dt, zs, out)
+
+
+# natural continuous extension of rk4, coefficients of theta, theta**2, theta**3
+RK4_DENSE_B = np.array([[1.0, -3.0/2, 2.0/3],
+                        [0.0, 1.0, -2.0/3],
+                        [0.0, 1.0, -2.0/3],
+                        [0.0, -1.0/2, 2.0/3]])
+
+
+def rhs(func, inplace=False, stats=None):
+    """rhs_inplace(func, inplace), counted and timed by stats if it is given."""
+
+    f = rhs_inplace(func, inplace)
+    if stats is not None:
+        f = stats.wrap(f)
+    return f
+
+
+def integrate(stepper, z, time, tracker=None, dense=None, stats=None):
+    """Fill the rows z[1:] of an array from allocate_solution by stepping
+    through time with one of the steppers above.
+    Returns z and the corresponding times. With an EventTracker the arrays
+    end at the step where the integration was stopped by terminal events;
+    for a single state vector its last row is then the event state and the
+    last time is the event time. Every step is passed to the DenseCollector
+    dense if it is given, and timed by the SolverStats stats if it records
+    step times."""
+
+    timed = stats is not None and stats.record_steps
+    if tracker is None and dense is None and not timed:
+        for i in range(len(time)-1):
+            stepper.step(z[i], time[i], time[i+1] - time[i], z[i+1])
+        return z, time
+
+    clock = _time.perf_counter
+    for i in range(len(time)-1):
+        dt = time[i+1] - time[i]
+        if timed:
+            start = clock()
+            stepper.step(z[i], time[i], dt, z[i+1])
+            stats.step_times.append(clock() - start)
+        else:
+            stepper.step(z[i], time[i], dt, z[i+1])
+        if dense is not None:
+            dense.record(z[i], time[i], dt, z[i+1])
+        if tracker is None:
+            continue
+        if tracker.check(z[i], z[i+1], time[i], time[i+1],
+                         getattr(stepper, 'k1', None), getattr(stepper, 'f_end', None)):
+            t = time[:i+2].copy()
+            if not tracker.ensemble:
+                t[-1] = tracker.t_stop
+            return z[:i+2], t
+        if tracker.t_f1 is not None and hasattr(stepper, 'known'):
+            stepper.known(tracker.t_f1, tracker.f1)
+    return z, time
+
+
+def _output(z, t, tracker, full_output, info=None, dense=None):
+    """Return value of the schemes: z, or (z, info) if full_output is True,
+    where info holds the times t of the rows of z, the event results and
+    the DenseOutput sol."""
+
+    if not full_output and dense is None:
+        return z
+    info = dict(info or {})
+    info['t'] = t
+    if tracker is not None:
+        info.update(tracker.results())
+    if dense is not None:
+        info['sol'] = dense.result()
+    return z, info
+
+
+def _solve(stepper, z, time, events, full_output, dense_output=False, info=None,
+           stats=None):
+    start = _time.perf_counter()
+    tracker = None
+    if events is not None:
+        from .events import EventTracker
+        tracker = EventTracker(events, stepper.f, z[0], time[0])
+    dense = None
+    if dense_output:
+        from .dense import DenseCollector
+        B = RK4_DENSE_B if stepper.dense is not None else None
+        dense = DenseCollector(stepper, B)
+    z, t = integrate(stepper, z, time, tracker, dense, stats)
+    output = _output(z, t, tracker, full_output, info, dense)
+    helpers = [helper for helper in (tracker, dense) if helper is not None]
+    if hasattr(stepper, 'nfev'):    # reported by the implicit schemes
+        stepper.nfev += sum(helper.nfev for helper in helpers)
+    if stats is not None:
+        stats.naccept += len(t) - 1
+        stats.nfev_saved += getattr(stepper, 'nfev_saved', 0)
+        for helper in helpers:
+            stats.nfev_saved += helper.nfev_saved
+        stats.njev += getattr(stepper, 'njev', 0)
+        stats.nlu += getattr(stepper, 'nlu', 0)
+        stats.time_total += _time.perf_counter() - start
+    return output
+
+
+# define Euler solver
+def euler(func, z0, time, inplace=False, events=None, full_output=False,
+          dense_output=False, stats=None, dtype=float, accumulate=False):
+    """The Euler scheme for solution of systems of ODEs.
+    z0 is a vector for the initial conditions,
+    the right hand side of the system is represented by func which returns
+    a vector with the same size as z0 .
+    If z0 is an (n_members, n_states) array the whole ensemble is advanced
+    at once; see allocate_solution.
+    With inplace=True func is called as func(z, t, out) and writes into out;
+    see rhs_inplace. No arrays are then allocated inside the time loop.
+    events is an event function g(z, t) or a list of them; see EventTracker.
+    If full_output is True a dict with the times t of the rows of z and the
+    event times and states (t_events, z_events) is returned as well.
+    With dense_output=True the dict is always returned and holds the
+    DenseOutput sol, which evaluates the solution at any times; it is
+    the cubic Hermite interpolant of the time steps.
+    A SolverStats object passed as stats is filled with counts and timings.
+    dtype is the floating point type of the solution and the stage buffers,
+    e.g. np.float32 to halve the memory traffic of large ensembles; with
+    accumulate=True the state is updated in float64 (see ExplicitStepper)."""
+
+    z = allocate_solution(z0, time, dtype)
+    stepper = EulerStepper(rhs(func, inplace, stats), z.shape[1:], dtype, accumulate)
+    return _solve(stepper, z, time, events, full_output, dense_output, stats=stats)
+
+
+# define Heun solver
+def heun(func, z0, time, inplace=False, events=None, full_output=False,
+         dense_output=False, stats=None, dtype=float, accumulate=False):
+    """The Heun scheme for solution of systems of ODEs.
+    z0 is a vector for the initial conditions,
+    the right hand side of the system is represented by func which returns
+    a vector with the same size as z0 .
+    If z0 is an (n_members, n_states) array the whole ensemble is advanced
+    at once; see allocate_solution.
+    With inplace=True func is called as func(z, t, out) and writes into out;
+    see rhs_inplace. No arrays are then allocated inside the time loop.
+    events is an event function g(z, t) or a list of them; see EventTracker.
+    If full_output is True a dict with the times t of the rows of z and the
+    event times and states (t_events, z_events) is returned as well.
+    With dense_output=True the dict is always returned and holds the
+    DenseOutput sol, which evaluates the solution at any times; it is
+    the cubic Hermite interpolant of the time steps.
+    A SolverStats object passed as stats is filled with counts and timings.
+    dtype is the floating point type of the solution and the stage buffers,
+    e.g. np.float32 to halve the memory traffic of large ensembles; with
+    accumulate=True the state is updated in float64 (see ExplicitStepper)."""
+
+    z = allocate_solution(z0, time, dtype)
+    stepper = HeunStepper(rhs(func, inplace, stats), z.shape[1:], dtype, accumulate)
+    return _solve(stepper, z, time, events, full_output, dense_output, stats=stats)
+
+
+# define rk4 scheme
+def rk4(func, z0, time, inplace=False, events=None, full_output=False,
+        dense_output=False, stats=None, dtype=float, accumulate=False):
+    """The Runge-Kutta 4 scheme for solution of systems of ODEs.
+    z0 is a vector for the initial conditions,
+    the right hand side of the system is represented by func which returns
+    a vector with the same size as z0 .
+    If z0 is an (n_members, n_states) array the whole ensemble is advanced
+    at once; see allocate_solution.
+    With inplace=True func is called as func(z, t, out) and writes into out;
+    see rhs_inplace. No arrays are then allocated inside the time loop.
+    events is an event function g(z, t) or a list of them; see EventTracker.
+    If full_output is True a dict with the times t of the rows of z and the
+    event times and states (t_events, z_events) is returned as well.
+    With dense_output=True the dict is always returned and holds the
+    DenseOutput sol, which evaluates the solution at any times; it is
+    the third order natural continuous extension of rk4.
+    A SolverStats object passed as stats is filled with counts and timings.
+    dtype is the floating point type of the solution and the stage buffers,
+    e.g. np.float32 to halve the memory traffic of large ensembles; with
+    accumulate=True the state is updated in float64 (see ExplicitStepper)."""
+
+    z = allocate_solution(z0, time, dtype)
+    stepper = RK4Stepper(rhs(func, inplace, stats), z.shape[1:], dtype, accumulate)
+    return _solve(stepper, z, time, events, full_output, dense_output, stats=stats)
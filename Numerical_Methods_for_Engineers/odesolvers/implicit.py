@@ -0,0 +1,237 @@
+"""Implicit schemes for stiff systems: backward_euler, crank_nicolson and bdf2."""
+
+import numpy as np
+
+from .explicit import allocate_solution, rhs, _solve, stepper_state, set_stepper_state
+
+
+class ImplicitStepper(object):
+    """Base class for implicit one-step schemes which solve
+        znew = r + gamma*dt*f(znew, t + dt)
+    for znew with Newton iterations. The Jacobian of f and the LU
+    factorization of I - gamma*dt*J are kept from step to step; the LU is
+    recomputed when gamma*dt changes and the Jacobian when the Newton
+    iterations converge slowly or fail. jac(z, t) returns the (n, n) Jacobian
+    of f; without it a forward difference Jacobian is used (n calls of f).
+    A changed gamma*dt is only refactorized if it differs by more than
+    lu_rtol, as round-off in the time grid should not trigger a new LU.
+    After a step f_end holds f(znew, t + dt), recovered from the converged
+    Newton equation, for reuse by the event detection and dense output."""
+    order = None
+    dense = None
+    lu_rtol = 1e-3
+    state_attrs = ('J', 'LU', 'gdt', 'f_end', 'nfev', 'njev', 'nlu', 'nfev_saved')
+
+    def __init__(self, f, shape, jac=None, newton_tol=1e-10, max_newton=7):
+        from scipy.linalg import lu_factor, lu_solve
+
+        if len(shape) != 1:
+            raise ValueError('implicit schemes integrate a single state vector, '
+                             'not an ensemble')
+        self.lu_factor, self.lu_solve = lu_factor, lu_solve
+        self.f = f
+        self.jac = jac
+        self.newton_tol = newton_tol
+        self.max_newton = max_newton
+        n = shape[0]
+        self.J = None
+        self.LU = None
+        self.gdt = None                 # gamma*dt of the current LU
+        self.fz = np.zeros(n)
+        self.r = np.zeros(n)
+        self.res = np.zeros(n)
+        self.f_end = np.zeros(n)
+        self.nfev = self.njev = self.nlu = 0
+        self.nfev_saved = 0
+
+    def get_state(self):
+        return stepper_state(self)
+
+    def set_state(self, state):
+        set_stepper_state(self, state)
+
+    def jacobian(self, z, t):
+        self.njev += 1
+        if self.jac is not None:
+            self.J = np.asarray(self.jac(z, t), dtype=float).reshape(z.size, z.size)
+            return
+        f0 = self.f(z, t, np.zeros_like(z))
+        J = np.zeros((z.size, z.size))
+        zp = z.copy()
+        for j in range(z.size):
+            eps = np.sqrt(np.finfo(float).eps)*max(1.0, abs(z[j]))
+            zp[j] = z[j] + eps
+            J[:, j] = (self.f(zp, t, self.fz) - f0)/eps
+            zp[j] = z[j]
+        self.nfev += z.size + 1
+        self.J = J
+
+    def factorize(self, gdt):
+        self.LU = self.lu_factor(np.eye(self.J.shape[0]) - gdt*self.J)
+        self.gdt = gdt
+        self.nlu += 1
+
+    def newton(self, z, t, gamma, dt, out):
+        """Solve out = r + gamma*dt*f(out, t) with out = z as starting value."""
+        gdt = gamma*dt
+        fresh = False
+        if self.J is None:
+            self.jacobian(z, t)
+            fresh = True
+        while True:
+            if fresh or abs(gdt - self.gdt) > self.lu_rtol*abs(self.gdt):
+                self.factorize(gdt)
+            out[...] = z
+            rate, dx_old = None, None
+            for k in range(self.max_newton):
+                self.f(out, t, self.fz)
+                self.nfev += 1
+                np.multiply(self.fz, gdt, out=self.res)    # -G(out)
+                self.res += self.r
+                self.res -= out
+                dx = self.lu_solve(self.LU, self.res)
+                out += dx
+                dx_norm = np.max(np.abs(dx))
+                if dx_old is not None:
+                    rate = dx_norm/dx_old
+                    if rate >= 1.0:
+                        break
+                dx_old = dx_norm
+                if dx_norm <= self.newton_tol*(1.0 + np.max(np.abs(out))):
+                    if k > 2 or (rate is not None and rate > 0.5):
+                        self.J = None           # converging slowly, refresh J
+                    np.subtract(out, self.r, out=self.f_end)
+                    self.f_end /= gdt
+                    return out
+            if fresh:
+                raise RuntimeError('%s: Newton iterations did not converge at t = %g; '
+                                   'reduce the time step' % (type(self).__name__, t))
+            self.jacobian(z, t)                 # retry with a fresh Jacobian
+            fresh = True
+
+
+def _continues(t_end, t, dt):
+    """True if a step starting at t continues the previous step, which ended
+    at t_end, up to round-off in the time grid."""
+    return t_end is not None and abs(t - t_end) <= 1e-8*abs(dt)
+
+
+class BackwardEulerStepper(ImplicitStepper):
+    """One step of the backward (implicit) Euler scheme."""
+    order = 1
+
+    def step(self, z, t, dt, out):
+        """Advance z from t to t + dt and write the new state into out."""
+        self.r[...] = z
+        return self.newton(z, t + dt, 1.0, dt, out)
+
+
+class TrapezoidalStepper(ImplicitStepper):
+    """One step of the trapezoidal (Crank-Nicolson) scheme.
+    f_end of one step is reused as f(z) of the next one."""
+    order = 2
+    state_attrs = ImplicitStepper.state_attrs + ('t_end',)
+
+    def __init__(self, f, shape, **kwargs):
+        ImplicitStepper.__init__(self, f, shape, **kwargs)
+        self.t_end = None
+
+    def step(self, z, t, dt, out):
+        """Advance z from t to t + dt and write the new state into out."""
+        if _continues(self.t_end, t, dt):
+            self.nfev_saved += 1
+        else:
+            self.f(z, t, self.f_end)
+            self.nfev += 1
+        np.multiply(self.f_end, dt/2.0, out=self.r)
+        self.r += z
+        self.newton(z, t + dt, 0.5, dt, out)
+        self.t_end = t + dt
+        return out
+
+
+class BDF2Stepper(ImplicitStepper):
+    """One step of the variable step size, second order backward
+    differentiation formula. The first step (and any step not continuing
+    from the previous one) is a backward Euler step."""
+    order = 2
+    state_attrs = ImplicitStepper.state_attrs + ('z_old', 't_end', 'dt_old')
+
+    def __init__(self, f, shape, **kwargs):
+        ImplicitStepper.__init__(self, f, shape, **kwargs)
+        self.z_old = np.zeros(shape)
+        self.t_end = None
+        self.dt_old = None
+
+    def step(self, z, t, dt, out):
+        """Advance z from t to t + dt and write the new state into out."""
+        if _continues(self.t_end, t, dt):
+            w = dt/self.dt_old
+            gamma = (1.0 + w)/(1.0 + 2.0*w)
+            np.multiply(z, (1.0 + w)**2/(1.0 + 2.0*w), out=self.r)
+            self.r -= w**2/(1.0 + 2.0*w)*self.z_old
+        else:
+            gamma = 1.0
+            self.r[...] = z
+        self.z_old[...] = z
+        self.t_end, self.dt_old = t + dt, dt
+        return self.newton(z, t + dt, gamma, dt, out)
+
+
+def _implicit(stepper_class, func, z0, time, jac, inplace, newton_tol, max_newton,
+              events, full_output, dense_output, stats):
+    z = allocate_solution(z0, time)
+    stepper = stepper_class(rhs(func, inplace, stats), z.shape[1:], jac=jac,
+                            newton_tol=newton_tol, max_newton=max_newton)
+    z = _solve(stepper, z, time, events, full_output, dense_output, stats=stats)
+    if full_output or dense_output:
+        z[1].update(nfev=stepper.nfev, njev=stepper.njev, nlu=stepper.nlu)
+    return z
+
+
+# define implicit schemes
+def backward_euler(func, z0, time, jac=None, inplace=False, newton_tol=1e-10,
+                   max_newton=7, events=None, full_output=False,
+                   dense_output=False, stats=None):
+    """The backward (implicit) Euler scheme for solution of stiff systems of ODEs.
+    z0 is a vector for the initial conditions,
+    the right hand side of the system is represented by func which returns
+    a vector with the same size as z0 .
+    Each step solves znew = z + dt*func(znew, t + dt) with Newton iterations;
+    jac(z, t) is the Jacobian of func, which is otherwise approximated by
+    finite differences. The Jacobian and its LU factorization are reused
+    from step to step; see ImplicitStepper.
+    events, full_output and dense_output as for euler; the dict then also holds
+    the number of evaluations of func (nfev) and jac (njev) and of LU
+    factorizations (nlu). A SolverStats object passed as stats is filled with
+    the same counts and the timings."""
+
+    return _implicit(BackwardEulerStepper, func, z0, time, jac, inplace,
+                     newton_tol, max_newton, events, full_output,
+                     dense_output, stats)
+
+
+def crank_nicolson(func, z0, time, jac=None, inplace=False, newton_tol=1e-10,
+                   max_newton=7, events=None, full_output=False,
+                   dense_output=False, stats=None):
+    """The trapezoidal (Crank-Nicolson) scheme for solution of stiff systems
+    of ODEs, znew = z + dt/2*(func(z, t) + func(znew, t + dt)).
+    Arguments and return values as for backward_euler."""
+
+    return _implicit(TrapezoidalStepper, func, z0, time, jac, inplace,
+                     newton_tol, max_newton, events, full_output,
+                     dense_output, stats)
+
+
+def bdf2(func, z0, time, jac=None, inplace=False, newton_tol=1e-10,
+         max_newton=7, events=None, full_output=False,
+         dense_output=False, stats=None):
+    """The second order backward differentiation formula for solution of
+    stiff systems of ODEs; for a constant time step
+        znew = 4/3*z - 1/3*zold + 2/3*dt*func(znew, t + dt).
+    Non-uniform time steps are allowed. Arguments and return values as for
+    backward_euler."""
+
+    return _implicit(BDF2Stepper, func, z0, time, jac, inplace,
+                     newton_tol, max_newton, events, full_output,
+                     dense_output, stats)
@@ -0,0 +1,87 @@
+"""Measure how long `import odesolvers` takes in a fresh interpreter.
+
+    python -m odesolvers.importtime [--module ODEschemes] [--repeat 5] [--log importtime.csv]
+
+Prints the median import time over the repeats and the slowest modules
+reported by python -X importtime, and exits with an error if the import
+pulled in matplotlib or any solver module beyond the explicit schemes,
+which are imported on first use. --module ODEschemes checks the chapter
+module ch1/ODEschemes.py (--path selects another chapter directory).
+With --log the median is appended to a csv file (date, module, seconds),
+which keeps track of the import time over time."""
+
+import os
+import subprocess
+import sys
+import time
+
+# the modules of the package which a plain import may load
+EAGER = ('odesolvers', 'odesolvers.explicit')
+
+
+def import_profile(module='odesolvers', path=None):
+    """Import module in a new interpreter with -X importtime, from the
+    directory path below the repository root (default: the root).
+    Returns the cumulative import time in seconds of every imported module
+    as a dict, and the list of all modules loaded by the import."""
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if path is not None:
+        root = os.path.join(root, path)
+    code = 'import sys; import %s; print(" ".join(sorted(sys.modules)))' % module
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=root,
+                          capture_output=True, text=True, check=True)
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        cumulative[name.strip()] = int(cumulative_us)*1e-6
+    return cumulative, proc.stdout.split()
+
+
+def measure(module='odesolvers', repeat=5, path=None):
+    """Median cumulative import time of module in seconds, the slowest
+    imported modules of the last run and the modules that were loaded."""
+
+    times = []
+    for i in range(repeat):
+        cumulative, modules = import_profile(module, path)
+        times.append(cumulative[module])
+    slowest = sorted(cumulative.items(), key=lambda item: -item[1])[:10]
+    return sorted(times)[len(times)//2], slowest, modules
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--module', default='odesolvers')
+    parser.add_argument('--path', help='directory below the repository root to import '
+                        'from (default: ch1 for ODEschemes)')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--log', help='csv file to append the median to')
+    args = parser.parse_args(argv)
+
+    path = args.path
+    if path is None and args.module == 'ODEschemes':
+        path = 'ch1'
+    median, slowest, modules = measure(args.module, args.repeat, path)
+    print('import %s: %.1f ms (median of %d)' % (args.module, 1e3*median, args.repeat))
+    for name, seconds in slowest:
+        print('  %8.1f ms  %s' % (1e3*seconds, name))
+    if args.log:
+        with open(args.log, 'a') as log:
+            log.write('%s,%s,%.6f\n' % (time.strftime('%Y-%m-%dT%H:%M:%S'),
+                                        args.module, median))
+    plotting = [name for name in modules if name.split('.')[0] == 'matplotlib']
+    if plotting:
+        sys.exit('importing %s loaded matplotlib' % args.module)
+    eager = [name for name in modules
+             if name.split('.')[0] == 'odesolvers' and name not in EAGER]
+    if eager:
+        sys.exit('importing %s loaded %s' % (args.module, ', '.join(eager)))
+
+
+if __name__ == '__main__':
+    main()
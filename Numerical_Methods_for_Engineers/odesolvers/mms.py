@@ -0,0 +1,186 @@
+"""The method of manufactured solutions: the right hand side of the first
+order system of an ODE with the source term of a manufactured solution.
+sympy is needed to build a ManufacturedSolution, but not to use the cached
+numeric code or the right hand side in worker processes."""
+
+import hashlib
+import os
+
+import numpy as np
+
+from .convergence import cache_dir
+
+
+# stage times t + c*dt of the schemes, at which the source term is precomputed
+STAGE_C = {'euler': (0.0,),
+           'heun': (0.0, 1.0),
+           'rk4': (0.0, 0.5, 1.0),
+           'adams_bashforth': (0.0, 0.5, 1.0),     # rk4 startup steps
+           'adams_moulton': (0.0, 0.5, 1.0),
+           'backward_euler': (1.0,),
+           'crank_nicolson': (0.0, 1.0),
+           'bdf2': (1.0,)}
+
+_VERSION = 2                # of the generated code, part of the cache key
+
+
+def _generate(solution, operator, t):
+    """Python source of the numeric functions of a manufactured solution and
+    of its constant ORDER, the order of the ODE."""
+    from sympy import Function, Derivative, Symbol, symbols, solve, Eq
+    from sympy.printing.numpy import NumPyPrinter
+
+    u = Function('u')(t)
+    L = operator(u, t)
+    derivatives = L.atoms(Derivative)
+    n = max([d.derivative_count for d in derivatives] or [0])
+    if n == 0:
+        raise ValueError('the operator contains no derivatives of u')
+    z = symbols('z0:%d' % (n + 1))
+    g = Symbol('g')
+    Lz = L
+    for k in range(n, 0, -1):
+        Lz = Lz.subs(u.diff(t, k), z[k])
+    Lz = Lz.subs(u, z[0])
+    highest = solve(Eq(Lz, g), z[n])
+    if len(highest) != 1:
+        raise ValueError('the highest derivative of u can not be isolated from %s = g'
+                         % (L,))
+
+    printer = NumPyPrinter()
+    code = ['import numpy', '', '',
+            'ORDER = %d' % n, '', '',
+            'def source(t):',
+            '    return %s + 0*t' % printer.doprint(operator(solution, t)), '', '',
+            'def exact(t):',
+            '    return %s + 0*t' % printer.doprint(solution), '', '',
+            'def state(t):',
+            '    return numpy.stack([%s], axis=-1)'
+            % ', '.join('%s + 0*t' % printer.doprint(solution.diff(t, k)) for k in range(n)),
+            '', '',
+            'def highest(z, t, g):']
+    code += ['    z%d = z[..., %d]' % (k, k) for k in range(n)]
+    code += ['    return %s' % printer.doprint(highest[0]), '']
+    return '\n'.join(code)
+
+
+class MMSRightHandSide(object):
+    """Right hand side f(z, t, out=None) of the first order system
+        z0' = z1, ..., z(n-2)' = z(n-1), z(n-1)' = highest(z, t, g(t))
+    of an ODE of order n with the source term g. The values of g at the
+    times in table are looked up instead of evaluated; other times fall
+    back to evaluating g. Instances can be pickled, e.g. to run them in
+    worker processes, and identity identifies them for func_identity."""
+
+    def __init__(self, code, order, table=None, identity=''):
+        self.code = code
+        self.order = order
+        self.table = table if table is not None else {}
+        self.identity = identity
+        self._build()
+
+    def _build(self):
+        namespace = {}
+        exec(compile(self.code, '<manufactured solution>', 'exec'), namespace)
+        self.source = namespace['source']
+        self.highest = namespace['highest']
+
+    def __getstate__(self):
+        return {'code': self.code, 'order': self.order, 'table': self.table,
+                'identity': self.identity}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._build()
+
+    def __call__(self, z, t, out=None):
+        zout = np.empty_like(z) if out is None else out
+        g = self.table.get(t) if np.ndim(t) == 0 else None
+        if g is None:
+            g = self.source(t)
+        zout[..., :-1] = z[..., 1:]
+        zout[..., -1] = self.highest(z, t, g)
+        return zout
+
+
+class ManufacturedSolution(object):
+    """Manufactured solution u(t) = solution of the ODE operator(u, t) = g(t).
+    solution is a sympy expression in the symbol t and operator(u, t)
+    returns a sympy expression in u and its derivatives, e.g. for
+    u''' + u*u'' + u' = g
+        operator = lambda u, t: u.diff(t, 3) + u*u.diff(t, 2) + u.diff(t)
+    The highest derivative is isolated, and numeric (numpy) functions of the
+    source term g, the exact solution and the right hand side are
+    generated. The generated code is cached in cache_dir()/mms keyed by a
+    hash of the expressions, so sympy only differentiates, solves and
+    prints them once; if the cache can not be read or written the code is
+    generated every time.
+
+    Attributes: order (of the ODE), source(t), exact(t) and state(t), the
+    exact state [u, u', ..., u^(order-1)], all vectorized in t."""
+
+    def __init__(self, solution, operator, t, cache=True):
+        from sympy import Function, srepr
+
+        L = operator(Function('u')(t), t)
+        key = hashlib.sha1(('%d|%s|%s|%s' % (_VERSION, srepr(solution), srepr(L),
+                                             srepr(t))).encode()).hexdigest()
+        filename = None
+        code = None
+        if cache:                   # an unusable cache only means generating the code
+            directory = os.path.join(cache_dir(), 'mms')
+            filename = os.path.join(directory, key + '.py')
+            try:
+                if os.path.exists(filename):
+                    with open(filename) as f:
+                        code = f.read()
+            except OSError:
+                code = None
+        if code is None:
+            code = _generate(solution, operator, t)
+            if filename is not None:
+                tmp = '%s.%d.tmp' % (filename, os.getpid())
+                try:
+                    os.makedirs(directory, exist_ok=True)
+                    with open(tmp, 'w') as f:
+                        f.write(code)
+                    os.replace(tmp, filename)
+                except OSError:
+                    if os.path.exists(tmp):
+                        os.remove(tmp)
+        self.key = key
+        self.code = code
+        namespace = {}
+        exec(compile(code, '<manufactured solution>', 'exec'), namespace)
+        self.source = namespace['source']
+        self.exact = namespace['exact']
+        self.state = namespace['state']
+        self.order = namespace['ORDER']
+
+    def rhs(self, times=(), schemes=(), c=None):
+        """The right hand side func(z, t, out=None) of the first order system,
+        a MMSRightHandSide. The source term is precomputed, in one vectorized
+        call, at the stage times t_i + c_j*(t_i+1 - t_i) of the time grids in
+        times (one grid or a list of them), where c holds the stage fractions
+        of the schemes (see STAGE_C) or is given."""
+        if c is None:
+            c = sorted(set(cj for scheme in schemes
+                           for cj in STAGE_C.get(getattr(scheme, '__name__', scheme), (0.0,))))
+        if len(times) > 0 and np.ndim(times[0]) == 0:
+            times = [times]
+        stage_times = []
+        for time in times:
+            time = np.asarray(time, dtype=float)
+            dt = np.diff(time)
+            for cj in c:
+                if cj == 0.0:
+                    stage_times.append(time)
+                elif cj == 1.0:
+                    stage_times.append(time[:-1] + dt)
+                else:
+                    stage_times.append(time[:-1] + dt*cj)
+        table = {}
+        if stage_times:
+            t_all = np.concatenate(stage_times)
+            table = dict(zip(t_all.tolist(), self.source(t_all).tolist()))
+        return MMSRightHandSide(self.code, self.order, table, 'mms:' + self.key)
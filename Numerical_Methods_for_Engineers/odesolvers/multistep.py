@@ -0,0 +1,154 @@
+"""Explicit linear multistep schemes: adams_bashforth and the predictor-corrector
+adams_moulton, which reuse the values of f from the previous time steps."""
+
+import numpy as np
+
+from .explicit import allocate_solution, rhs, _solve, ExplicitStepper, RK4Stepper
+
+
+# weights of f_n, f_n-1, ... for a constant time step
+AB_BETA = {2: np.array([3.0, -1.0])/2,
+           3: np.array([23.0, -16.0, 5.0])/12,
+           4: np.array([55.0, -59.0, 37.0, -9.0])/24}
+# weights of f_n+1, f_n, f_n-1, ...
+AM_BETA = {2: np.array([1.0, 1.0])/2,
+           3: np.array([5.0, 8.0, -1.0])/12,
+           4: np.array([9.0, 19.0, -5.0, 1.0])/24}
+
+
+class AdamsBashforthStepper(ExplicitStepper):
+    """One step of the Adams-Bashforth scheme of the given order (2-4),
+        znew = z + dt*sum_j beta_j*f_n-j,
+    which costs one evaluation of f per step. The values f_n-j are kept in
+    a ring buffer; the first order - 1 steps, and every step which does not
+    continue the previous one with the same time step, are rk4 steps.
+    The buffers have the floating point type dtype of the states."""
+    state_attrs = ExplicitStepper.state_attrs + ('F', 'head', 'nhist', 't_end', 'dt')
+
+    def __init__(self, f, shape, order=4, dtype=float):
+        if order not in AB_BETA:
+            raise ValueError('order must be 2, 3 or 4, not %r' % (order,))
+        ExplicitStepper.__init__(self, f, shape, dtype)
+        self.order = order
+        self.beta = AB_BETA[order]
+        self.F = np.zeros((order,) + tuple(shape), dtype=dtype)   # f_n, f_n-1, ... in a ring
+        self.head = 0
+        self.nhist = 0                  # number of valid entries of F
+        self.t_end = None
+        self.dt = None
+        self.tmp = np.zeros(shape, dtype=dtype)
+        self.starter = RK4Stepper(f, shape, dtype)
+
+    def _history(self, t, dt):
+        """Move the ring to the slot of f_n and return the number of values
+        of f from the previous steps which may be used with the step dt."""
+        if self.t_end is None or abs(t - self.t_end) > 1e-8*abs(dt) or \
+                abs(dt - self.dt) > 1e-8*abs(dt):
+            self.nhist = 0
+        self.head = (self.head + 1) % self.order
+        return self.nhist
+
+    def _combine(self, beta, first, z, dt, out):
+        """out = z + dt*sum_j beta_j*f_n-j with f_n-j from the ring, plus
+        first if it is not None."""
+        F, tmp, m, scalar = self.F, self.tmp, self.order, self.scalar
+        np.multiply(F[self.head], scalar(dt*beta[0]), out=out)
+        for j in range(1, len(beta)):
+            np.multiply(F[(self.head - j) % m], scalar(dt*beta[j]), out=tmp)
+            out += tmp
+        if first is not None:
+            out += first
+        out += z
+        return out
+
+    def _start(self, z, t, dt, out):
+        """rk4 step used while the history is too short."""
+        if self.t_known is not None and self.t_known == t:
+            self.starter.known(t, self.f_known)
+            self.t_known = None
+        self.starter.step(z, t, dt, out)
+        self.nfev_saved += self.starter.nfev_saved
+        self.starter.nfev_saved = 0
+        self.k1[...] = self.starter.k1
+        self.F[self.head] = self.k1
+
+    def _end(self, t, dt):
+        self.nhist = min(self.nhist + 1, self.order)
+        self.t_end, self.dt = t + dt, dt
+
+    def step(self, z, t, dt, out):
+        """Advance z from t to t + dt and write the new state into out."""
+        if self._history(t, dt) < self.order - 1:
+            self._start(z, t, dt, out)
+        else:
+            self.F[self.head] = self.first_stage(z, t)
+            self._combine(self.beta, None, z, dt, out)
+        self._end(t, dt)
+        return out
+
+
+class AdamsMoultonStepper(AdamsBashforthStepper):
+    """One PECE step of the Adams-Moulton scheme of the given order (2-4):
+    an Adams-Bashforth prediction of the same order, an evaluation of f,
+    the Adams-Moulton correction with this value for f_n+1 and a final
+    evaluation of f_n+1 = f(znew, t + dt), which is reused as f_n of the
+    next step (kept in f_end). This costs two evaluations of f per step
+    and has a much smaller error constant than adams_bashforth."""
+
+    def __init__(self, f, shape, order=4, dtype=float):
+        AdamsBashforthStepper.__init__(self, f, shape, order, dtype)
+        self.gamma = AM_BETA[order]
+        self.f_end = self.f_known
+        self.fp = np.zeros(shape, dtype=dtype)
+
+    def step(self, z, t, dt, out):
+        """Advance z from t to t + dt and write the new state into out."""
+        if self._history(t, dt) < self.order - 1:
+            self._start(z, t, dt, out)
+            self.f(out, t + dt, self.f_end)
+        else:
+            self.F[self.head] = self.first_stage(z, t)
+            self._combine(self.beta, None, z, dt, out)         # predict
+            self.f(out, t + dt, self.fp)                        # evaluate
+            self.fp *= self.scalar(dt*self.gamma[0])
+            self._combine(self.gamma[1:], self.fp, z, dt, out)  # correct
+            self.f(out, t + dt, self.f_end)                     # evaluate
+        self._end(t, dt)
+        self.t_known = t + dt
+        return out
+
+
+def _uniform(time, name):
+    dt = np.diff(np.asarray(time, dtype=float))
+    if len(dt) > 0 and np.max(np.abs(dt - dt[0])) > 1e-8*abs(dt[0]):
+        raise ValueError('%s needs a uniform time grid' % name)
+
+
+# define Adams schemes
+def adams_bashforth(func, z0, time, order=4, inplace=False, events=None,
+                    full_output=False, dense_output=False, stats=None, dtype=float):
+    """The Adams-Bashforth scheme of order 2, 3 or 4 for solution of systems
+    of ODEs on a uniform time grid. It is started with rk4 steps and then
+    needs a single evaluation of func per step, since the values of func
+    from the previous steps are kept; see AdamsBashforthStepper.
+    The other arguments and the return values are as for rk4; the dense
+    output is the cubic Hermite interpolant of the time steps. The solution
+    is not accumulated in float64 for a dtype like np.float32."""
+
+    _uniform(time, 'adams_bashforth')
+    z = allocate_solution(z0, time, dtype)
+    stepper = AdamsBashforthStepper(rhs(func, inplace, stats), z.shape[1:], order, dtype)
+    return _solve(stepper, z, time, events, full_output, dense_output, stats=stats)
+
+
+def adams_moulton(func, z0, time, order=4, inplace=False, events=None,
+                  full_output=False, dense_output=False, stats=None, dtype=float):
+    """The Adams-Moulton predictor-corrector (PECE) scheme of order 2, 3 or 4
+    for solution of systems of ODEs on a uniform time grid, with two
+    evaluations of func per step; see AdamsMoultonStepper.
+    Arguments and return values as for adams_bashforth."""
+
+    _uniform(time, 'adams_moulton')
+    z = allocate_solution(z0, time, dtype)
+    stepper = AdamsMoultonStepper(rhs(func, inplace, stats), z.shape[1:], order, dtype)
+    return _solve(stepper, z, time, events, full_output, dense_output, stats=stats)
@@ -0,0 +1,126 @@
+"""Parareal: time parallel integration with a cheap coarse scheme and an
+accurate fine scheme which runs on the time slices in worker processes."""
+
+import os
+import time as _time
+
+import numpy as np
+
+from .explicit import allocate_solution, euler, rk4
+
+
+def _slices(n_time, n_slices):
+    """Indices of the first time of each slice and the last time."""
+    bounds = np.linspace(0, n_time - 1, n_slices + 1).round().astype(int)
+    return np.unique(bounds)
+
+
+def _fine_slice(task):
+    """Worker: the fine solution on one slice, from the state at its start."""
+    fine, func, z0, time, inplace = task
+    return fine(func, z0, time, inplace=inplace)
+
+
+def _coarse_end(coarse, func, z0, time, coarse_every, inplace):
+    """State at the end of a slice from the coarse scheme, which takes every
+    coarse_every-th time of the slice (and its last)."""
+    t = time[::coarse_every]
+    if t[-1] != time[-1]:
+        t = np.append(t, time[-1])
+    return coarse(func, z0, t, inplace=inplace)[-1]
+
+
+def parareal(func, z0, time, n_slices=None, coarse=euler, fine=rk4, coarse_every=10,
+             tol=1e-8, max_iter=None, workers=None, inplace=False, serial=False,
+             full_output=False):
+    """Solve dz/dt = func(z, t) at the times in time with the parareal
+    algorithm. time is split into n_slices slices (default: the number of
+    workers), and the correction
+        U[k+1] = G(U[k]) + F(U_old[k]) - G(U_old[k])
+    is iterated, where F is the fine scheme (rk4 or any other scheme with
+    the same arguments, on the times of the slice) and G the coarse scheme
+    (euler on every coarse_every-th time). The fine solutions of the slices
+    run in a pool of worker processes; slices at the start which have
+    converged are not solved again. The iterations stop when the largest
+    change of U is below tol*(1 + max|U|), and after at most n_slices
+    iterations (a larger max_iter is reduced to n_slices) the result
+    equals the serial fine solution.
+    func, coarse and fine must be picklable, i.e. defined at module level,
+    and scripts using parareal need an if __name__ == '__main__': guard.
+    workers=1 solves the slices in this process.
+
+    Returns z, the fine solution on time, or (z, info) if full_output is
+    True, where info holds the number of iterations, converged, the changes
+    of U in each iteration (corrections), the slice boundaries and the run
+    time (time_parareal). With serial=True the serial fine solution is also
+    timed and info holds time_serial, speedup and the largest difference
+    from it (error_serial)."""
+
+    time = np.asarray(time, dtype=float)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if n_slices is None:
+        n_slices = workers
+    start = _time.perf_counter()
+    bounds = _slices(len(time), n_slices)
+    n_slices = len(bounds) - 1
+    # after n_slices iterations every slice has started from the fine solution
+    max_iter = n_slices if max_iter is None else min(max_iter, n_slices)
+    t_slices = [time[bounds[k]:bounds[k+1]+1] for k in range(n_slices)]
+
+    z = allocate_solution(z0, time)
+    U = np.zeros((n_slices + 1,) + z.shape[1:])
+    U[0] = z[0]
+    G_old = np.zeros((n_slices,) + z.shape[1:])
+    for k in range(n_slices):           # serial coarse sweep
+        G_old[k] = _coarse_end(coarse, func, U[k], t_slices[k], coarse_every, inplace)
+        U[k+1] = G_old[k]
+
+    pool = None
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        pool = ProcessPoolExecutor(max_workers=min(workers, n_slices))
+    fine_z = [None]*n_slices
+    corrections = []
+    converged = False
+    first = 0                           # slices before first are converged
+    try:
+        for it in range(max_iter):
+            tasks = [(fine, func, U[k], t_slices[k], inplace)
+                     for k in range(first, n_slices)]
+            results = pool.map(_fine_slice, tasks) if pool else map(_fine_slice, tasks)
+            for k, zk in zip(range(first, n_slices), results):
+                fine_z[k] = zk
+            U_new = U.copy()
+            U_new[first+1] = fine_z[first][-1]  # the first slice started exactly
+            first += 1
+            for k in range(first, n_slices):
+                G_new = _coarse_end(coarse, func, U_new[k], t_slices[k], coarse_every,
+                                    inplace)
+                U_new[k+1] = G_new + fine_z[k][-1] - G_old[k]
+                G_old[k] = G_new
+            change = np.max(np.abs(U_new - U))
+            U = U_new
+            corrections.append(change)
+            if change <= tol*(1.0 + np.max(np.abs(U))):
+                converged = True
+                break
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    for k in range(n_slices):
+        z[bounds[k]:bounds[k+1]+1] = fine_z[k]
+    if not full_output:
+        return z
+
+    info = {'iterations': len(corrections), 'converged': converged or first >= n_slices,
+            'corrections': np.asarray(corrections), 'bounds': bounds,
+            'time_parareal': _time.perf_counter() - start}
+    if serial:
+        start = _time.perf_counter()
+        z_serial = fine(func, z0, time, inplace=inplace)
+        info['time_serial'] = _time.perf_counter() - start
+        info['speedup'] = info['time_serial']/info['time_parareal']
+        info['error_serial'] = np.max(np.abs(z - z_serial))
+    return z, info
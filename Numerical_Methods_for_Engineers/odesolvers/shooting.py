@@ -0,0 +1,126 @@
+"""The shooting method for two point boundary value problems, for a batch
+of problems (e.g. a sweep over a parameter) integrated as one ensemble."""
+
+import numpy as np
+
+from .explicit import rk4
+
+
+def _members(z0, target, guesses, params):
+    """Number of boundary value problems in the batch."""
+    shapes = [np.shape(target)] + [np.shape(s) for s in guesses]
+    if params is not None:
+        shapes.append((len(params),))
+    if np.ndim(z0) > 1:
+        shapes.append((np.shape(z0)[0],))
+    shape = np.broadcast_shapes(*shapes)
+    if len(shape) > 1:
+        raise ValueError('target, guesses and params must be scalars or 1D, got shape %s'
+                         % (shape,))
+    return shape[0] if shape else 1
+
+
+def _shots(scheme, func, z0, time, params, inplace, stats):
+    """Solve the initial value problems of the members with the initial
+    states z0 and the parameters params as one ensemble."""
+    if params is None:
+        f = func
+    elif inplace:
+        def f(z, t, out):
+            return func(z, t, params, out)
+    else:
+        def f(z, t):
+            return func(z, t, params)
+    return scheme(f, z0, time, inplace=inplace, stats=stats)
+
+
+def shoot(func, z0, time, target, guesses=(1.0, 1.5), params=None, unknown=1,
+          component=0, scheme=rk4, tol=1E-10, max_iter=20, inplace=False,
+          full_output=False, stats=None):
+    """Solve the boundary value problems
+        dz/dt = func(z, t, p),  z(time[0]) = z0 with z[unknown] = s,
+        z[component](time[-1]) = target
+    of a batch of members by the shooting method: the unknown initial
+    value s of each member is found by secant updates from the two
+    guesses. target, the guesses and params (one row per member; passed as
+    p to func, which then gets the rows of the members being integrated)
+    are scalars or arrays with one value per member; z0 is a vector or an
+    (n_members, n_states) array. Without params func is called as
+    func(z, t) (or func(z, t, out) with inplace=True, and func(z, t, p, out)
+    with params). func gets the (n, n_states) states of n members at once.
+
+    All members and both guesses are integrated as one ensemble by scheme
+    (rk4 or any other scheme with the same arguments), then only the
+    members which have not converged, i.e. |z[component](time[-1]) -
+    target| > tol*(1 + |target|), are integrated with their secant update.
+    A linear problem converges after one update, so a sweep costs two
+    ensemble integrations (of both guesses and of the updates) whatever the
+    number of members.
+
+    Returns z, an (n_time, n_members, n_states) array with the solutions,
+    and s, the initial values, or (z, s, info) if full_output is True,
+    where info holds converged and failed (per member; the secant update
+    of a failed member was impossible), the residuals at time[-1],
+    the number of iterations (secant updates) of each member, the number
+    of ensemble integrations (shots) and the number of member solutions
+    computed (nsolve)."""
+
+    time = np.asarray(time, dtype=float)
+    n = _members(z0, target, guesses, params)
+    z0 = np.array(np.broadcast_to(z0, (n, np.shape(z0)[-1] if np.ndim(z0) else 1)),
+                  dtype=float)
+    target = np.broadcast_to(np.asarray(target, dtype=float), (n,))
+    scale = tol*(1.0 + np.abs(target))
+    if params is not None:
+        params = np.asarray(params, dtype=float)
+        if params.ndim == 0 or len(params) != n:
+            params = np.broadcast_to(params, (n,) + params.shape[1:])
+
+    # both guesses of all members as one ensemble
+    s_old = np.broadcast_to(np.asarray(guesses[0], dtype=float), (n,)).copy()
+    s = np.broadcast_to(np.asarray(guesses[1], dtype=float), (n,)).copy()
+    z0_both = np.concatenate([z0, z0])
+    z0_both[:n, unknown] = s_old
+    z0_both[n:, unknown] = s
+    p_both = None if params is None else np.concatenate([params, params])
+    z_both = _shots(scheme, func, z0_both, time, p_both, inplace, stats)
+    phi_old = z_both[-1, :n, component] - target
+    phi = z_both[-1, n:, component] - target
+    z = z_both[:, n:].copy()
+    # a first guess which already hits the target is kept
+    first = (np.abs(phi_old) <= scale) & (np.abs(phi) > scale)
+    z[:, first] = z_both[:, :n][:, first]
+    s[first], phi[first] = s_old[first], phi_old[first]
+    del z_both
+
+    iterations = np.zeros(n, dtype=int)
+    converged = np.abs(phi) <= scale
+    failed = np.zeros(n, dtype=bool)   # flat secant or diverged shot: no update
+    shots, nsolve = 1, 2*n
+    for it in range(max_iter):
+        active = np.flatnonzero(~converged & ~failed)
+        dphi = phi[active] - phi_old[active]
+        ok = np.isfinite(dphi) & (dphi != 0.0)
+        failed[active[~ok]] = True
+        active, dphi = active[ok], dphi[ok]
+        if active.size == 0:
+            break
+        s_new = s[active] - phi[active]*(s[active] - s_old[active])/dphi
+        z0_active = z0[active]
+        z0_active[:, unknown] = s_new
+        z_active = _shots(scheme, func, z0_active, time,
+                          None if params is None else params[active], inplace, stats)
+        shots += 1
+        nsolve += active.size
+        s_old[active], phi_old[active] = s[active], phi[active]
+        s[active] = s_new
+        phi[active] = z_active[-1, :, component] - target[active]
+        z[:, active] = z_active
+        iterations[active] += 1
+        converged[active] = np.abs(phi[active]) <= scale[active]
+
+    if not full_output:
+        return z, s
+    info = {'converged': converged, 'residual': phi, 'iterations': iterations,
+            'failed': failed, 'shots': shots, 'nsolve': nsolve}
+    return z, s, info
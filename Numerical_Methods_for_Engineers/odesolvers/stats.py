@@ -0,0 +1,76 @@
+"""Opt-in instrumentation of the schemes."""
+
+import time
+
+import numpy as np
+
+
+class SolverStats(object):
+    """Counters and timings of a run of one of the schemes, filled in when
+    it is passed as stats=... :
+        nfev        calls of func, including those for events, dense output
+                    and finite difference Jacobians
+        nfev_saved  calls of func avoided by reusing values of f already
+                    known, e.g. the last stage of a step as the first stage
+                    of the next (first same as last)
+        naccept     accepted steps (all steps of a fixed step scheme)
+        nreject     rejected steps of an adaptive scheme
+        njev, nlu   Jacobian evaluations and LU factorizations (implicit)
+        time_rhs    seconds spent inside func
+        time_total  seconds spent in the scheme, so that time_solver =
+                    time_total - time_rhs is the overhead of the stepper
+        step_times  wall clock time of every step, if step_times=True
+    The same object may be passed to several runs to accumulate them.
+    Timing every call of func costs about a microsecond per call, so
+    leave stats out of production runs where that matters."""
+
+    def __init__(self, step_times=False):
+        self.nfev = 0
+        self.nfev_saved = 0
+        self.naccept = 0
+        self.nreject = 0
+        self.njev = 0
+        self.nlu = 0
+        self.time_rhs = 0.0
+        self.time_total = 0.0
+        self.record_steps = step_times
+        self.step_times = []
+
+    @property
+    def time_solver(self):
+        return self.time_total - self.time_rhs
+
+    def wrap(self, f):
+        """Return the in-place right hand side f(z, t, out) counted and timed."""
+        clock = time.perf_counter
+
+        def counted(z, t, out):
+            start = clock()
+            result = f(z, t, out)
+            self.time_rhs += clock() - start
+            self.nfev += 1
+            return result
+
+        return counted
+
+    def histogram(self, bins=20):
+        """np.histogram of the recorded step times."""
+        return np.histogram(np.asarray(self.step_times), bins=bins)
+
+    def summary(self):
+        lines = ['nfev = %d (%d saved), naccept = %d, nreject = %d'
+                 % (self.nfev, self.nfev_saved, self.naccept, self.nreject)]
+        if self.njev or self.nlu:
+            lines.append('njev = %d, nlu = %d' % (self.njev, self.nlu))
+        if self.time_total > 0:
+            lines.append('time: total %.3g s, rhs %.3g s (%.0f %%), solver %.3g s'
+                         % (self.time_total, self.time_rhs,
+                            100*self.time_rhs/self.time_total, self.time_solver))
+        if self.step_times:
+            steps = np.asarray(self.step_times)
+            lines.append('step time: mean %.3g s, min %.3g s, max %.3g s'
+                         % (steps.mean(), steps.min(), steps.max()))
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return 'SolverStats(%s)' % self.summary().replace('\n', '; ')
@@ -0,0 +1,170 @@
+"""Streaming versions of the fixed step schemes, for runs whose history does
+not fit in memory."""
+
+import time as _time
+
+import numpy as np
+
+from .explicit import state_shape, rhs
+
+
+# scheme name: (module, stepper class); the module is imported on first use
+STEPPERS = {'euler': ('explicit', 'EulerStepper'),
+            'heun': ('explicit', 'HeunStepper'),
+            'rk4': ('explicit', 'RK4Stepper'),
+            'adams_bashforth': ('multistep', 'AdamsBashforthStepper'),
+            'adams_moulton': ('multistep', 'AdamsMoultonStepper'),
+            'symplectic_euler': ('symplectic', 'SymplecticEulerStepper'),
+            'verlet': ('symplectic', 'VerletStepper'),
+            'yoshida4': ('symplectic', 'Yoshida4Stepper'),
+            'backward_euler': ('implicit', 'BackwardEulerStepper'),
+            'crank_nicolson': ('implicit', 'TrapezoidalStepper'),
+            'bdf2': ('implicit', 'BDF2Stepper')}
+# the schemes which integrate in another floating point type than float64,
+# and those of them which can accumulate the solution in float64
+DTYPE_SCHEMES = ('euler', 'heun', 'rk4', 'adams_bashforth', 'adams_moulton',
+                 'symplectic_euler', 'verlet', 'yoshida4')
+ACCUMULATE_SCHEMES = ('euler', 'heun', 'rk4')
+
+
+def stepper_class(scheme):
+    """The stepper class of scheme, which is a scheme function or its name."""
+    from importlib import import_module
+
+    module, cls = STEPPERS[getattr(scheme, '__name__', scheme)]
+    return getattr(import_module('.' + module, __package__), cls)
+
+
+def precision_options(scheme, dtype=float, accumulate=False):
+    """The keyword arguments of the stepper of scheme for states of the
+    floating point type dtype, accumulated in float64 if accumulate is True
+    (see ExplicitStepper); empty for float64. The implicit schemes solve in
+    float64 only, and only euler, heun and rk4 accumulate; ValueError is
+    raised for the others."""
+
+    name = getattr(scheme, '__name__', scheme)
+    options = {}
+    if np.dtype(dtype) != np.float64:
+        if name not in DTYPE_SCHEMES:
+            raise ValueError('%s integrates in float64 only, not in %s'
+                             % (name, np.dtype(dtype)))
+        options['dtype'] = np.dtype(dtype)
+    if accumulate:
+        if name not in ACCUMULATE_SCHEMES:
+            raise ValueError('accumulate=True needs one of %s, not %s'
+                             % (', '.join(ACCUMULATE_SCHEMES), name))
+        options['accumulate'] = True
+    return options
+
+
+def stream(scheme, func, z0, time, chunk_size=1024, save_every=1, inplace=False,
+           stats=None, dtype=float, accumulate=False):
+    """Generator version of the fixed step schemes for runs whose full
+    history does not fit in memory.
+    scheme is one of the functions (or its name) of STEPPERS: euler, heun,
+    rk4, adams_bashforth, adams_moulton (of order 4), symplectic_euler,
+    verlet, yoshida4, backward_euler, crank_nicolson and bdf2. Only the
+    states z[::save_every] at the times time[::save_every] are kept, and
+    they are yielded in pairs (t_chunk, z_chunk) of at most chunk_size rows.
+    The chunk arrays are reused for the next chunk, so copy them (or write
+    them to a sink, see run_to_sink) before asking for the next one.
+    A SolverStats object passed as stats is filled with counts and timings;
+    the time spent by the consumer of the chunks is not included.
+    dtype is the floating point type of the states and the chunks, and
+    accumulate=True updates the state in float64, as for rk4; see
+    precision_options for the schemes which support them."""
+
+    if save_every < 1 or chunk_size < 1:
+        raise ValueError('save_every and chunk_size must be positive')
+    shape = state_shape(z0)
+    stepper = stepper_class(scheme)(rhs(func, inplace, stats), shape,
+                                    **precision_options(scheme, dtype, accumulate))
+    timed = stats is not None and stats.record_steps
+    clock = _time.perf_counter
+    start = clock()
+
+    t_chunk = np.zeros(chunk_size)
+    z_chunk = np.zeros((chunk_size,) + shape, dtype=dtype)
+    z = np.zeros(shape, dtype=dtype)
+    znew = np.zeros(shape, dtype=dtype)
+    z[...] = np.asarray(z0).reshape(shape)
+
+    n = 0
+    for i in range(len(time)):
+        if i % save_every == 0:
+            t_chunk[n] = time[i]
+            z_chunk[n] = z
+            n += 1
+            if n == chunk_size:
+                if stats is not None:
+                    stats.time_total += clock() - start
+                yield t_chunk, z_chunk
+                start = clock()
+                n = 0
+        if i < len(time) - 1:
+            if timed:
+                start_step = clock()
+                stepper.step(z, time[i], time[i+1] - time[i], znew)
+                stats.step_times.append(clock() - start_step)
+            else:
+                stepper.step(z, time[i], time[i+1] - time[i], znew)
+            z, znew = znew, z
+            if stats is not None:
+                stats.naccept += 1
+    if stats is not None:
+        stats.nfev_saved += getattr(stepper, 'nfev_saved', 0)
+        stats.njev += getattr(stepper, 'njev', 0)
+        stats.nlu += getattr(stepper, 'nlu', 0)
+        stats.time_total += clock() - start
+    if n > 0:
+        yield t_chunk[:n], z_chunk[:n]
+
+
+class NpySink(object):
+    """Sink for stream which writes the saved states to a memory-mapped .npy
+    file, so that the history never has to fit in memory.
+    The times are written to t_filename if it is given, and the states in
+    the floating point type dtype.
+    Any object with the methods write(t_chunk, z_chunk) and close() may be
+    used as a sink, e.g. one that keeps a running mean or maximum."""
+
+    def __init__(self, filename, time, z0, save_every=1, t_filename=None, dtype=float):
+        from numpy.lib.format import open_memmap
+
+        nrows = len(range(0, len(time), save_every))
+        self.z = open_memmap(filename, mode='w+', dtype=dtype,
+                             shape=(nrows,) + state_shape(z0))
+        self.t = None
+        if t_filename is not None:
+            self.t = open_memmap(t_filename, mode='w+', dtype=float, shape=(nrows,))
+        self.n = 0
+
+    def write(self, t_chunk, z_chunk):
+        m = len(t_chunk)
+        self.z[self.n:self.n + m] = z_chunk
+        if self.t is not None:
+            self.t[self.n:self.n + m] = t_chunk
+        self.n += m
+
+    def close(self):
+        self.z.flush()
+        if self.t is not None:
+            self.t.flush()
+
+
+def run_to_sink(sink, scheme, func, z0, time, chunk_size=1024, save_every=1,
+                inplace=False, stats=None, dtype=float, accumulate=False):
+    """Run stream and pass every chunk to sink.write; returns the sink.
+    Example writing every 1000th state of a long run to disk:
+        sink = NpySink('z.npy', time, z0, save_every=1000)
+        run_to_sink(sink, rk4, f, z0, time, save_every=1000)
+        z = np.load('z.npy', mmap_mode='r')
+    For float32 states pass dtype=np.float32 to both NpySink and run_to_sink."""
+
+    try:
+        for t_chunk, z_chunk in stream(scheme, func, z0, time, chunk_size,
+                                       save_every, inplace, stats, dtype, accumulate):
+            sink.write(t_chunk, z_chunk)
+    finally:
+        sink.close()
+    return sink
@@ -0,0 +1,148 @@
+"""Symplectic schemes for separable Hamiltonian systems: symplectic_euler,
+verlet (leapfrog) and the 4th order Yoshida composition yoshida4."""
+
+import numpy as np
+
+from .explicit import allocate_solution, rhs, _solve, stepper_state, set_stepper_state
+
+
+# kick (c) and drift (d) coefficients of the splitting schemes; a step is
+#   p += c[0]*dt*F(q), q += d[0]*dt*G(p), p += c[1]*dt*F(q), ...
+_W1 = 1.0/(2.0 - 2.0**(1.0/3))
+_W0 = -2.0**(1.0/3)/(2.0 - 2.0**(1.0/3))
+SPLITTINGS = {'symplectic_euler': ([1.0], [1.0]),
+              'verlet': ([0.5, 0.5], [1.0]),
+              'yoshida4': ([_W1/2, (_W1 + _W0)/2, (_W0 + _W1)/2, _W1/2],
+                           [_W1, _W0, _W1])}
+
+
+class SplittingStepper(object):
+    """One step of a kick-drift splitting scheme for a separable system
+        dq/dt = G(p), dp/dt = F(q)
+    with the state z = [q, p] (the first half of the components are the
+    positions q, the second half the momenta p, as in pendulum_func).
+    f is the usual right hand side [G(p), F(q)] of the whole state; each
+    kick and drift evaluates it once and uses the half it needs. When the
+    last substep is a kick, F(q) of the new state is kept and used by the
+    first kick of the next step (first same as last). Time dependent forces
+    are evaluated at the time of the positions. The buffers have the
+    floating point type dtype of the states."""
+    dense = None
+    state_attrs = ('F', 't_end', 'nfev_saved')
+
+    def __init__(self, f, shape, kicks, drifts, order, dtype=float):
+        if shape[-1] % 2 != 0:
+            raise ValueError('a separable system needs a state [q, p] with an '
+                             'even number of components, not %d' % shape[-1])
+        self.f = f
+        self.kicks = kicks
+        self.drifts = drifts
+        self.order = order
+        self.n = shape[-1]//2
+        self.scalar = np.dtype(dtype).type  # of the factors dt*..., which would promote
+        self.fz = np.zeros(shape, dtype=dtype)
+        self.F = np.zeros(shape[:-1] + (self.n,), dtype=dtype)
+        self.t_end = None
+        self.nfev_saved = 0
+
+    def get_state(self):
+        return stepper_state(self)
+
+    def set_state(self, state):
+        set_stepper_state(self, state)
+
+    def step(self, z, t, dt, out):
+        """Advance z from t to t + dt and write the new state into out."""
+        f, fz, F, n, scalar = self.f, self.fz, self.F, self.n, self.scalar
+        q, p = out[..., :n], out[..., n:]
+        out[...] = z
+        tq = t
+        for j, d in enumerate(self.drifts):
+            if j == 0 and self.t_end is not None and abs(t - self.t_end) <= 1e-8*abs(dt):
+                self.nfev_saved += 1       # F(q) from the last kick of the previous step
+            else:
+                f(out, tq, fz)
+                F[...] = fz[..., n:]
+            p += scalar(self.kicks[j]*dt)*F
+            f(out, tq, fz)
+            q += scalar(d*dt)*fz[..., :n]
+            tq += d*dt
+        self.t_end = None
+        if len(self.kicks) > len(self.drifts):
+            f(out, t + dt, fz)
+            F[...] = fz[..., n:]
+            p += scalar(self.kicks[-1]*dt)*F
+            self.t_end = t + dt
+        return out
+
+
+class SymplecticEulerStepper(SplittingStepper):
+    """One step of the symplectic Euler scheme, p first:
+        pnew = p + dt*F(q), qnew = q + dt*G(pnew)."""
+
+    def __init__(self, f, shape, dtype=float):
+        SplittingStepper.__init__(self, f, shape, *SPLITTINGS['symplectic_euler'], order=1,
+                                  dtype=dtype)
+
+
+class VerletStepper(SplittingStepper):
+    """One step of the Stormer-Verlet (leapfrog) scheme in kick-drift-kick
+    form, with two evaluations of f per step."""
+
+    def __init__(self, f, shape, dtype=float):
+        SplittingStepper.__init__(self, f, shape, *SPLITTINGS['verlet'], order=2,
+                                  dtype=dtype)
+
+
+class Yoshida4Stepper(SplittingStepper):
+    """One step of the 4th order composition of three Verlet steps by
+    Yoshida (1990), with six evaluations of f per step."""
+
+    def __init__(self, f, shape, dtype=float):
+        SplittingStepper.__init__(self, f, shape, *SPLITTINGS['yoshida4'], order=4,
+                                  dtype=dtype)
+
+
+def _splitting(stepper_class, func, z0, time, inplace, events, full_output,
+               dense_output, stats, dtype):
+    z = allocate_solution(z0, time, dtype)
+    stepper = stepper_class(rhs(func, inplace, stats), z.shape[1:], dtype)
+    return _solve(stepper, z, time, events, full_output, dense_output, stats=stats)
+
+
+# define symplectic schemes
+def symplectic_euler(func, z0, time, inplace=False, events=None, full_output=False,
+                     dense_output=False, stats=None, dtype=float):
+    """The symplectic Euler scheme for separable Hamiltonian systems
+        dq/dt = G(p), dp/dt = F(q)
+    with z0 = [q0, p0] and func(z, t) = [G(p), F(q)], like pendulum_func.
+    It is first order like euler, but the energy of e.g. a pendulum stays
+    bounded instead of growing from period to period.
+    The other arguments and the return values are as for euler, but the
+    solution is not accumulated in float64 for a dtype like np.float32."""
+
+    return _splitting(SymplecticEulerStepper, func, z0, time, inplace, events,
+                      full_output, dense_output, stats, dtype)
+
+
+def verlet(func, z0, time, inplace=False, events=None, full_output=False,
+           dense_output=False, stats=None, dtype=float):
+    """The second order Stormer-Verlet (leapfrog) scheme for separable
+    Hamiltonian systems, with two evaluations of func per step.
+    Arguments and return values as for symplectic_euler."""
+
+    return _splitting(VerletStepper, func, z0, time, inplace, events,
+                      full_output, dense_output, stats, dtype)
+
+
+leapfrog = verlet
+
+
+def yoshida4(func, z0, time, inplace=False, events=None, full_output=False,
+             dense_output=False, stats=None, dtype=float):
+    """The fourth order symplectic scheme of Yoshida, a composition of three
+    Verlet steps, for separable Hamiltonian systems.
+    Arguments and return values as for symplectic_euler."""
+
+    return _splitting(Yoshida4Stepper, func, z0, time, inplace, events,
+                      full_output, dense_output, stats, dtype)